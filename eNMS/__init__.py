@@ -10,7 +10,7 @@ from eNMS.variables import vs
 def initialize():
     server.register_plugins()
     first_init = db._initialize(env)
-    if env.detect_cli():
+    if env.detect_cli() or env.detect_spawned_process():
         return
     form_factory._initialize()
     controller._initialize(first_init)
@@ -1,16 +1,18 @@
 from collections import Counter, defaultdict
 from contextlib import redirect_stdout
+from csv import QUOTE_ALL, writer
 from datetime import datetime
 from difflib import unified_diff
 from dramatiq import actor
 from flask_login import current_user
 from functools import wraps
 from git import Repo
-from io import BytesIO, StringIO
+from gzip import open as open_gzip
+from io import StringIO
 from ipaddress import IPv4Network
-from json import dump, load
+from json import dump, dumps, load, loads
 from logging import info
-from operator import attrgetter, itemgetter
+from operator import attrgetter, gt, itemgetter, lt
 from os import getenv, listdir, makedirs, scandir
 from os.path import exists
 from pathlib import Path
@@ -18,15 +20,17 @@ from re import search, sub
 from requests import get as http_get
 from ruamel import yaml
 from shutil import rmtree
-from sqlalchemy import and_, cast, or_, String
+from sqlalchemy import and_, bindparam, cast, func, inspect, or_, select, String, update
 from sqlalchemy.exc import IntegrityError, OperationalError
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, MANYTOONE
 from sqlalchemy.sql.expression import true
 from subprocess import Popen
 from tarfile import open as open_tar
 from threading import current_thread, Thread
+from time import time
 from traceback import format_exc
 from uuid import uuid4
+from werkzeug.exceptions import NotFound
 from xlrd import open_workbook
 from xlrd.biffh import XLRDError
 from xlwt import Workbook
@@ -372,7 +376,15 @@ class Controller:
             filter_value = constraint_dict.get(f"{property}_filter")
             if not value and filter_value != "empty":
                 continue
-            if value in ("bool-true", "bool-false"):
+            if (
+                property in vs.configuration_properties
+                and db.configuration_storage["deduplication"]
+                and filter_value != "empty"
+            ):
+                constraint = db.get_configuration_constraint(
+                    row, property, value, filter_value
+                )
+            elif value in ("bool-true", "bool-false"):
                 constraint = row == (value == "bool-true")
             elif filter_value == "equality":
                 constraint = row == value
@@ -425,9 +437,20 @@ class Controller:
         table, pagination = vs.models[model], kwargs.get("pagination")
         query = db.query(model, rbac, username, properties=properties)
         total_records, filtered_records = (10**6,) * 2
+        if not bulk and not properties:
+            cache_key = self.get_table_cache_key(model, rbac, username, **kwargs)
+            counts = self.get_table_cache("count", *cache_key)
         if pagination and not bulk and not properties:
-            total_records = query.with_entities(table.id).count()
-        constraints = self.filtering_base_constraints(model, **kwargs)
+            if counts:
+                total_records, filtered_records = counts
+            else:
+                total_records = query.with_entities(table.id).count()
+        try:
+            constraints = self.filtering_base_constraints(model, **kwargs)
+        except db.regex_error:
+            if bulk or properties:
+                raise
+            return {"error": "Invalid regular expression as search parameter."}
         constraints.extend(table.filtering_constraints(**kwargs))
         query = self.filtering_relationship_constraints(query, model, **kwargs)
         query = query.filter(and_(*constraints))
@@ -437,32 +460,130 @@ class Controller:
                 return instances
             else:
                 return [getattr(instance, bulk) for instance in instances]
-        if pagination:
+        if pagination and not counts:
             filtered_records = query.with_entities(table.id).count()
+            counts = (total_records, filtered_records)
+            self.set_table_cache("count", *cache_key, value=counts)
         data = kwargs["columns"][int(kwargs["order"][0]["column"])]["data"]
-        ordering = getattr(getattr(table, data, None), kwargs["order"][0]["dir"], None)
+        direction, start = kwargs["order"][0]["dir"], int(kwargs["start"])
+        ordering = getattr(getattr(table, data, None), direction, None)
+        keyset = (
+            ordering
+            and vs.settings["tables"]["keyset_pagination"]
+            and data in inspect(table).column_attrs
+        )
         if ordering:
             query = query.order_by(ordering())
+            if data != "id":
+                query = query.order_by(getattr(table.id, direction)())
+        cursor = keyset and start and self.get_table_cache("cursor", *cache_key, start)
         try:
-            query_data = (
-                query.limit(int(kwargs["length"])).offset(int(kwargs["start"])).all()
-            )
+            if cursor:
+                page_query = query.filter(
+                    self.get_keyset_constraint(table, data, direction, *cursor)
+                )
+            else:
+                page_query = query.offset(start)
+            query_data = page_query.limit(int(kwargs["length"])).all()
         except OperationalError:
             return {"error": "Invalid regular expression as search parameter."}
+        if keyset and query_data and getattr(query_data[-1], data) is not None:
+            last_row, end = query_data[-1], start + len(query_data)
+            cursor = (getattr(last_row, data), last_row.id)
+            self.set_table_cache("cursor", *cache_key, end, value=cursor)
         table_result = {
             "draw": int(kwargs["draw"]),
             "recordsTotal": total_records,
             "recordsFiltered": filtered_records,
             "data": [obj.table_properties(**kwargs) for obj in query_data],
         }
-        if kwargs.get("export"):
-            table_result["full_result"] = [
-                obj.table_properties(**kwargs) for obj in query.all()
-            ]
         if kwargs.get("clipboard"):
-            table_result["full_result"] = ",".join(obj.name for obj in query.all())
+            names = query.with_entities(table.name)
+            table_result["full_result"] = ",".join(name for name, in names)
         return table_result
 
+    def stream_table_export(self, model, export_format="csv", **kwargs):
+        columns = kwargs.pop("export_columns", None)
+        if model not in vs.models:
+            raise NotFound
+        if export_format not in ("csv", "jsonl"):
+            raise Exception(f"Unsupported export format: '{export_format}'.")
+        if not columns:
+            raise Exception("No column selected for the export.")
+        batch_size = vs.settings["tables"]["export_batch_size"]
+        kwargs.update(draw=0, length=batch_size, pagination=False)
+        result = self.filtering(model, start=0, **kwargs)
+        if "error" in result:
+            raise Exception(result["error"])
+        return self.get_table_export_lines(
+            model, export_format, columns, result["data"], kwargs
+        )
+
+    def get_table_export_lines(self, model, export_format, columns, rows, kwargs):
+        batch_size, start = kwargs["length"], 0
+        if export_format == "csv":
+            yield self.get_csv_line(columns)
+        while True:
+            for row in rows:
+                if export_format == "csv":
+                    yield self.get_csv_line(row.get(column, "") for column in columns)
+                else:
+                    line = {column: row.get(column) for column in columns}
+                    yield f"{dumps(line, default=str)}\n"
+            if len(rows) < batch_size:
+                return
+            start += batch_size
+            result = self.filtering(model, start=start, **kwargs)
+            if "error" in result:
+                log = f"Export of '{model}' table failed ({result['error']})"
+                env.log("error", log)
+                raise Exception(result["error"])
+            rows = result["data"]
+
+    @staticmethod
+    def get_csv_line(values):
+        line = StringIO()
+        writer(line, quoting=QUOTE_ALL).writerow(values)
+        return line.getvalue()
+
+    @staticmethod
+    def get_keyset_constraint(table, property, direction, value, last_id):
+        column, compare = getattr(table, property), gt if direction == "asc" else lt
+        constraint = or_(
+            compare(column, value), and_(column == value, compare(table.id, last_id))
+        )
+        if db.dialect.startswith("postgresql") == (direction == "asc"):
+            constraint = or_(constraint, column.is_(None))
+        return constraint
+
+    def get_table_cache_key(self, model, rbac, username, **kwargs):
+        user = db.get_rbac_user(username)
+        if not rbac or not user or not user["rbac"]:
+            scope = "admin"
+        else:
+            scope = (user["id"], *sorted(user["groups"]))
+        filters = {
+            key: value
+            for key, value in kwargs.items()
+            if key not in ("clipboard", "draw", "length", "start")
+        }
+        return model, rbac, scope, dumps(filters, sort_keys=True, default=str)
+
+    @staticmethod
+    def get_table_cache(*key):
+        expiry, value = vs.table_cache.get(key, (0, None))
+        return value if expiry > time() else None
+
+    @staticmethod
+    def set_table_cache(*key, value):
+        cache_type, now = key[0], time()
+        if len(vs.table_cache) > vs.settings["tables"]["cache_size"]:
+            for cache_key, (expiry, _) in list(vs.table_cache.items()):
+                if expiry < now:
+                    vs.table_cache.pop(cache_key, None)
+        ttl = vs.settings["tables"][f"{cache_type}_cache_ttl"]
+        vs.table_cache[key] = (now + ttl, value)
+
     def get(self, model, id, **kwargs):
         if not kwargs:
             get_model = (
@@ -525,32 +646,79 @@ class Controller:
             env.log("error", f"Update of device configurations failed ({str(exc)})")
         env.log("info", "Git Content Update Successful")
 
+    def get_git_blob(self, repo, blob):
+        cache = vs.git_blob_cache
+        value = cache.pop(blob, None)
+        if value is None:
+            value = repo.odb.stream(bytes.fromhex(blob)).read().decode("utf-8")
+        cache[blob] = value
+        while len(cache) > vs.settings["app"]["git_blob_cache_size"]:
+            cache.pop(next(iter(cache)), None)
+        return value
+
     def get_git_history(self, device_id):
         device = db.fetch("device", id=device_id, rbac="configuration")
-        repo = Repo(vs.path / "network_data")
-        path = vs.path / "network_data" / device.name
-        return {
-            data_type: [
-                {"hash": str(commit), "date": commit.committed_datetime}
-                for commit in list(repo.iter_commits(paths=path / data_type))
-            ]
-            for data_type in vs.configuration_properties
-        }
+        try:
+            head = Repo(vs.path / "network_data").head.commit.hexsha
+        except Exception:
+            head = None
+        stale_index = db.fetch("parameters").git_history_commit != head
+        table = db.configuration_history_table
+        history = {property: [] for property in vs.configuration_properties}
+        query = (
+            select(table.c.property, table.c.commit, table.c.date)
+            .where(table.c.device == device.name)
+            .order_by(table.c.id.desc())
+        )
+        for property, commit, date in db.session.execute(query):
+            if property in history:
+                history[property].append(
+                    {"hash": commit, "date": datetime.fromisoformat(date)}
+                )
+        return {"history": history, "stale_index": bool(head) and stale_index}
 
     def get_git_network_data(self, device_name, hash):
-        commit, result = Repo(vs.path / "network_data").commit(hash), {}
+        repo, table = Repo(vs.path / "network_data"), db.configuration_history_table
         device = db.fetch("device", name=device_name, rbac="configuration")
-        for property in vs.configuration_properties:
-            try:
-                file = commit.tree / device_name / property
-                with BytesIO(file.data_stream.read()) as f:
-                    value = f.read().decode("utf-8")
-                result[property] = vs.custom.parse_configuration_property(
-                    device, property, value
-                )
-            except KeyError:
+        position = db.session.execute(
+            select(func.max(table.c.id)).where(
+                table.c.commit == hash, table.c.device == device_name
+            )
+        ).scalar()
+        blobs = {}
+        if position:
+            date = db.session.execute(
+                select(table.c.date).where(table.c.id == position)
+            ).scalar()
+            commit_datetime = datetime.fromisoformat(date)
+            for property in vs.configuration_properties:
+                blobs[property] = db.session.execute(
+                    select(table.c.blob)
+                    .where(
+                        table.c.device == device_name,
+                        table.c.property == property,
+                        table.c.id <= position,
+                    )
+                    .order_by(table.c.id.desc())
+                    .limit(1)
+                ).scalar()
+        else:
+            commit = repo.commit(hash)
+            commit_datetime = commit.committed_datetime
+            for property in vs.configuration_properties:
+                try:
+                    blobs[property] = (commit.tree / device_name / property).hexsha
+                except KeyError:
+                    blobs[property] = None
+        result = {}
+        for property, blob in blobs.items():
+            if not blob:
                 result[property] = ""
-        return {"result": result, "datetime": commit.committed_datetime}
+                continue
+            result[property] = vs.custom.parse_configuration_property(
+                device, property, self.get_git_blob(repo, blob)
+            )
+        return {"result": result, "datetime": commit_datetime}
 
     def get_migration_folders(self):
         return listdir(Path(vs.migration_path))
@@ -576,6 +744,56 @@ class Controller:
     def get_result(self, id):
         return db.fetch("result", id=id).result
 
+    def get_run_timings(self, service_id, runtime, maximum_devices=50):
+        run = db.fetch("run", allow_none=True, runtime=runtime)
+        if not run:
+            return {}
+        root, tree = str(service_id), {"children": {}, "count": 0, "duration": 0}
+        devices, service_ids = defaultdict(lambda: defaultdict(float)), set()
+        for timing in db.query("run_timing", rbac=None).filter_by(run_id=run.id):
+            frames = timing.stack.split(";")
+            if root not in frames:
+                continue
+            frames = frames[frames.index(root) :]
+            node = tree
+            for frame in frames:
+                if frame.isdigit():
+                    service_ids.add(int(frame))
+                node = node["children"].setdefault(
+                    frame, {"children": {}, "count": 0, "duration": 0}
+                )
+            node["count"] += timing.count
+            node["duration"] += timing.duration
+            if timing.device:
+                devices[timing.device][frames[-1]] += timing.duration
+        names = dict(
+            db.session.query(
+                vs.models["service"].id, vs.models["service"].scoped_name
+            ).filter(vs.models["service"].id.in_(service_ids))
+        )
+
+        def rec(frame, node):
+            return {
+                "name": names.get(int(frame), frame) if frame.isdigit() else frame,
+                "count": node["count"],
+                "duration": node["duration"],
+                "children": sorted(
+                    (rec(*child) for child in node["children"].items()),
+                    key=itemgetter("duration"),
+                    reverse=True,
+                ),
+            }
+
+        slowest_devices = sorted(
+            ({"name": name, **phases} for name, phases in devices.items()),
+            key=lambda device: device.get("device", 0),
+            reverse=True,
+        )
+        return {
+            "tree": [rec(*child) for child in tree["children"].items()],
+            "devices": slowest_devices[:maximum_devices],
+        }
+
     def get_runtimes(self, id, display=None):
         service_alias = aliased(vs.models["service"])
         query = (
@@ -911,6 +1129,17 @@ class Controller:
             path = Path(vs.migration_path) / kwargs["name"]
             if not exists(path):
                 makedirs(path)
+            jsonl_export = kwargs.get("export_format") == "jsonl"
+            stale_extension = "yaml" if jsonl_export else "jsonl.gz"
+            (path / f"{cls_name}.{stale_extension}").unlink(missing_ok=True)
+            if jsonl_export:
+                with open_gzip(path / f"{cls_name}.jsonl.gz", "wt") as migration_file:
+                    for instance in db.stream_export(
+                        cls_name,
+                        private_properties=kwargs["export_private_properties"],
+                    ):
+                        migration_file.write(f"{dumps(instance, default=str)}\n")
+                continue
             with open(path / f"{cls_name}.yaml", "w") as migration_file:
                 yaml.dump(
                     db.export(
@@ -931,7 +1160,15 @@ class Controller:
 
     def migration_import(self, folder="migrations", **kwargs):
         env.log("info", "Starting Migration Import")
-        env.log_events = False
+        try:
+            with db.import_scope():
+                return self.import_migration_files(folder, **kwargs)
+        finally:
+            if db.materialized_rbac:
+                db.update_rbac_access()
+                db.session.commit()
+
+    def import_migration_files(self, folder, **kwargs):
         status, models = "Import successful", kwargs["import_export_types"]
         empty_database = kwargs.get("empty_database_before_import", False)
         service_import = kwargs.get("service_import", False)
@@ -948,6 +1185,8 @@ class Controller:
             metadata = yaml.load(metadata_file, Loader=yaml.SafeLoader)
         if service_import and metadata["version"] != vs.server_version:
             return {"alert": "Import from an older version is not allowed"}
+        if kwargs.get("streaming_import") and not service_import:
+            return self.stream_migration_files(folder_path, **kwargs)
         if current_user:
             store["user"][current_user.name] = current_user
         for service_name in ("Start", "End", "Placeholder"):
@@ -958,13 +1197,12 @@ class Controller:
                 store["swiss_army_knife_service"][service.name] = service
                 store["service"][service.name] = service
         for model in models:
-            path = folder_path / f"{model}.yaml"
-            if not path.exists():
+            path = self.get_migration_path(folder_path, model)
+            if not path:
                 if service_import and model == "service":
                     raise Exception("Invalid archive provided in service import.")
                 continue
-            with open(path, "r") as migration_file:
-                instances = yaml.load(migration_file, Loader=yaml.CLoader)
+            instances = self.load_migration_file(path)
             before_time = datetime.now()
             env.log("info", f"Creating {model}s")
             for instance in instances:
@@ -1006,42 +1244,34 @@ class Controller:
             db.session.commit()
             total_time = datetime.now() - before_time
             env.log("info", f"{model.capitalize()}s created in {total_time}")
+        name_ids, relationship_time = {}, datetime.now()
         for model, instances in relations.items():
             env.log("info", f"Setting up {model}s database relationships")
             before_time = datetime.now()
-            for instance_name, related_models in instances.items():
-                for property, value in related_models.items():
-                    if not value:
-                        continue
-                    relation = vs.relationships[model][property]
-                    if relation["list"]:
-                        sql_value = []
-                        for name in value:
-                            if name not in store[relation["model"]]:
-                                related_instance = db.fetch(
-                                    relation["model"], name=name, allow_none=True
-                                )
-                                if related_instance:
-                                    store[relation["model"]][name] = related_instance
-                            if name in store[relation["model"]]:
-                                sql_value.append(store[relation["model"]][name])
-                    else:
-                        if value not in store[relation["model"]]:
-                            related_instance = db.fetch(
-                                relation["model"], name=value, allow_none=True
-                            )
-                            if related_instance:
-                                store[relation["model"]][value] = related_instance
-                        sql_value = store[relation["model"]][value]
-                    try:
-                        setattr(store[model].get(instance_name), property, sql_value)
-                    except Exception:
-                        info("\n".join(format_exc().splitlines()))
-                        if service_import:
-                            db.session.rollback()
-                            return "Error during import; service was not imported."
-                        status = {"alert": "Partial Import (see logs)."}
-            env.log("info", f"Relationships created in {datetime.now() - before_time}")
+            related_models = {model} | {
+                relation["model"]
+                for property, relation in vs.relationships[model].items()
+                if any(
+                    relation_dict.get(property) for relation_dict in instances.values()
+                )
+            }
+            for related_model in related_models - set(name_ids):
+                name_ids[related_model] = self.get_name_ids(related_model)
+            try:
+                self.import_relationships(model, instances, name_ids)
+            except Exception:
+                info("\n".join(format_exc().splitlines()))
+                if service_import:
+                    db.session.rollback()
+                    return "Error during import; service was not imported."
+                status = {"alert": "Partial Import (see logs)."}
+            total_time = datetime.now() - before_time
+            env.log(
+                "info", f"{model.capitalize()}s relationships created in {total_time}"
+            )
+        env.log(
+            "info", f"Relationships created in {datetime.now() - relationship_time}"
+        )
         db.session.commit()
         if service_import:
             service = store["service"][metadata["service"]]
@@ -1053,15 +1283,276 @@ class Controller:
             for model in ("user", "service", "network"):
                 for instance in store[model].values():
                     instance.post_update()
+            db.session.commit()
             env.log("info", f"Model update done ({datetime.now() - before_time}s)")
         if not kwargs.get("skip_pool_update"):
             before_time = datetime.now()
             env.log("info", "Starting pool update")
-            for pool in store["pool"].values():
-                pool.compute_pool()
+            vs.models["pool"].compute_pools(store["pool"].values())
+            env.log("info", f"Pool update done ({datetime.now() - before_time}s)")
+        db.session.commit()
+        env.log("info", f"{status} (execution time: {datetime.now() - start_time}s)")
+        return status
+
+    @staticmethod
+    def get_migration_path(folder_path, model):
+        paths = [
+            folder_path / f"{model}.{extension}" for extension in ("yaml", "jsonl.gz")
+        ]
+        paths = [path for path in paths if path.exists()]
+        if paths:
+            return max(paths, key=lambda path: path.stat().st_mtime)
+
+    @staticmethod
+    def load_migration_file(path):
+        if path.suffix == ".gz":
+            with open_gzip(path, "rt") as migration_file:
+                return [loads(line) for line in migration_file]
+        with open(path, "r") as migration_file:
+            return yaml.load(migration_file, Loader=yaml.CLoader)
+
+    @staticmethod
+    def get_migration_batches(path):
+        batch_size, lines, number = db.transactions["import_batch_size"], [], 0
+        if path.suffix == ".gz":
+            with open_gzip(path, "rt") as migration_file:
+                for line in migration_file:
+                    lines.append(loads(line))
+                    if len(lines) == batch_size:
+                        yield lines
+                        lines = []
+            if lines:
+                yield lines
+            return
+        with open(path, "r") as migration_file:
+            for line in migration_file:
+                if line.startswith("- "):
+                    if number == batch_size:
+                        yield yaml.load("".join(lines), Loader=yaml.CLoader)
+                        lines, number = [], 0
+                    number += 1
+                lines.append(line)
+        if lines:
+            yield yaml.load("".join(lines), Loader=yaml.CLoader) or []
+
+    @staticmethod
+    def fetch_by_names(model, names):
+        names, batch_size = list(names), db.transactions["import_batch_size"]
+        table, instances = vs.models[model], {}
+        for index in range(0, len(names), batch_size):
+            query = db.session.query(table).filter(
+                table.name.in_(names[index : index + batch_size])
+            )
+            instances.update((instance.name, instance) for instance in query)
+        return instances
+
+    @staticmethod
+    def get_name_ids(model, names=None):
+        table = vs.models[model]
+        query = db.session.query(table.name, table.id)
+        if names is None:
+            return dict(query)
+        names, batch_size = list(names), db.transactions["import_batch_size"]
+        name_ids = {}
+        for index in range(0, len(names), batch_size):
+            batch = names[index : index + batch_size]
+            name_ids.update(query.filter(table.name.in_(batch)))
+        return name_ids
+
+    def import_relationships(self, model, relations, name_ids):
+        instance_ids, batch_size = name_ids[model], db.transactions["import_batch_size"]
+        for property, relation in vs.relationships[model].items():
+            values = {
+                instance_ids[name]: relation_dict[property]
+                for name, relation_dict in relations.items()
+                if relation_dict.get(property) and name in instance_ids
+            }
+            if not values:
+                continue
+            relationship = inspect(vs.models[model]).relationships[property]
+            related_ids = name_ids[relation["model"]]
+            if relationship.secondary is not None:
+                table = relationship.secondary
+                column = relationship.synchronize_pairs[0][1]
+                related_column = relationship.secondary_synchronize_pairs[0][1]
+                ids = list(values)
+                for index in range(0, len(ids), batch_size):
+                    batch = ids[index : index + batch_size]
+                    db.session.execute(table.delete().where(column.in_(batch)))
+                rows = {
+                    (instance_id, related_ids[name])
+                    for instance_id, names in values.items()
+                    for name in names
+                    if name in related_ids
+                }
+                if rows:
+                    db.session.execute(
+                        table.insert(),
+                        [
+                            {column.name: instance_id, related_column.name: related_id}
+                            for instance_id, related_id in rows
+                        ],
+                    )
+                pool_model = {model, relation["model"]} - {"pool"}
+                if "pool" in (model, relation["model"]) and pool_model:
+                    self.update_pool_counters(pool_model.pop())
+            elif relationship.direction is MANYTOONE:
+                column = relationship.local_remote_pairs[0][0]
+                rows = [
+                    {"instance_id": instance_id, "related_id": related_ids[name]}
+                    for instance_id, name in values.items()
+                    if name in related_ids
+                ]
+                if rows:
+                    db.session.execute(
+                        update(column.table)
+                        .where(column.table.c.id == bindparam("instance_id"))
+                        .values({column.name: bindparam("related_id")}),
+                        rows,
+                    )
+            else:
+                column = relationship.local_remote_pairs[0][1]
+                ids = list(values)
+                for index in range(0, len(ids), batch_size):
+                    batch = ids[index : index + batch_size]
+                    db.session.execute(
+                        update(column.table)
+                        .where(column.in_(batch))
+                        .values({column.name: None})
+                    )
+                rows = [
+                    {"related_id": related_ids[name], "instance_id": instance_id}
+                    for instance_id, names in values.items()
+                    for name in names
+                    if name in related_ids
+                ]
+                if rows:
+                    db.session.execute(
+                        update(column.table)
+                        .where(column.table.c.id == bindparam("related_id"))
+                        .values({column.name: bindparam("instance_id")}),
+                        rows,
+                    )
+
+    @staticmethod
+    def update_pool_counters(model):
+        if model not in vs.models["pool"].models:
+            return
+        pool = vs.models["pool"]
+        relationship = inspect(pool).relationships[f"{model}s"]
+        column = relationship.synchronize_pairs[0][1]
+        number = (
+            select(func.count())
+            .select_from(relationship.secondary)
+            .where(column == pool.id)
+            .scalar_subquery()
+        )
+        db.session.execute(
+            update(pool)
+            .values({f"{model}_number": number})
+            .execution_options(synchronize_session="fetch")
+        )
+
+    def import_migration_relationships(self, model, instances):
+        relations, related_names = defaultdict(dict), defaultdict(set)
+        for instance in instances:
+            type = instance.get("type", model)
+            if type not in vs.models:
+                continue
+            relations[type][instance["name"]] = instance
+            related_names[type].add(instance["name"])
+            for property, relation in vs.relationships[type].items():
+                value = instance.get(property)
+                if value:
+                    names = value if relation["list"] else [value]
+                    related_names[relation["model"]].update(names)
+        name_ids = {
+            related_model: self.get_name_ids(related_model, names)
+            for related_model, names in related_names.items()
+        }
+        for type, type_relations in relations.items():
+            for related_model in vs.relationships[type].values():
+                name_ids.setdefault(related_model["model"], {})
+            self.import_relationships(type, type_relations, name_ids)
+
+    def stream_migration_files(self, folder_path, **kwargs):
+        status, start_time = "Import successful", datetime.now()
+        empty_database = kwargs.get("empty_database_before_import", False)
+        paths = {
+            model: self.get_migration_path(folder_path, model)
+            for model in kwargs["import_export_types"]
+        }
+        paths = {model: path for model, path in paths.items() if path}
+        existing_names = {
+            "service": {f"[Shared] {name}" for name in ("Start", "End", "Placeholder")},
+            "user": {current_user.name} if current_user else set(),
+        }
+        imported_names = defaultdict(list)
+        for model, path in paths.items():
+            before_time, number = datetime.now(), 0
+            env.log("info", f"Creating {model}s (streaming import)")
+            for instances in self.get_migration_batches(path):
+                for instance in instances:
+                    type = instance.pop("type", model)
+                    for related_model in vs.relationships[type]:
+                        instance.pop(related_model, None)
+                    if instance["name"] in existing_names.get(model, ()):
+                        continue
+                    private_properties = {
+                        property: env.get_password(instance.pop(property))
+                        for property in list(instance)
+                        if property in vs.private_properties_set
+                    }
+                    try:
+                        instance = db.factory(
+                            type,
+                            migration_import=True,
+                            no_fetch=empty_database,
+                            import_mechanism=True,
+                            **instance,
+                        )
+                        for property in private_properties.items():
+                            setattr(instance, *property)
+                        if model in ("user", "service", "network", "pool"):
+                            imported_names[model].append(instance.name)
+                    except Exception:
+                        info(f"{str(instance)} could not be imported:\n{format_exc()}")
+                        status = {"alert": "partial import (see logs)."}
+                db.session.commit()
+                number += len(instances)
+            total_time = datetime.now() - before_time
+            env.log("info", f"{number} {model}s created in {total_time}")
+        for model, path in paths.items():
+            env.log("info", f"Setting up {model}s database relationships")
+            before_time = datetime.now()
+            for instances in self.get_migration_batches(path):
+                try:
+                    self.import_migration_relationships(model, instances)
+                except Exception:
+                    info("\n".join(format_exc().splitlines()))
+                    db.session.rollback()
+                    status = {"alert": "Partial Import (see logs)."}
+                db.session.commit()
+            env.log("info", f"Relationships created in {datetime.now() - before_time}")
+        batch_size = db.transactions["import_batch_size"]
+        if not kwargs.get("skip_model_update"):
+            before_time = datetime.now()
+            env.log("info", "Starting model update")
+            for model in ("user", "service", "network"):
+                names = imported_names[model]
+                for index in range(0, len(names), batch_size):
+                    batch = names[index : index + batch_size]
+                    for instance in self.fetch_by_names(model, batch).values():
+                        instance.post_update()
+                    db.session.commit()
+            env.log("info", f"Model update done ({datetime.now() - before_time}s)")
+        if not kwargs.get("skip_pool_update"):
+            before_time = datetime.now()
+            env.log("info", "Starting pool update")
+            pools = self.fetch_by_names("pool", imported_names["pool"]).values()
+            vs.models["pool"].compute_pools(pools)
             env.log("info", f"Pool update done ({datetime.now() - before_time}s)")
         db.session.commit()
-        env.log_events = True
         env.log("info", f"{status} (execution time: {datetime.now() - start_time}s)")
         return status
 
@@ -1144,6 +1635,9 @@ class Controller:
         date_time_object = datetime.strptime(kwargs["date_time"], "%d/%m/%Y %H:%M:%S")
         date_time_string = date_time_object.strftime("%Y-%m-%d %H:%M:%S.%f")
         for model in kwargs["deletion_types"]:
+            if model == "configuration_chunk":
+                db.delete_unused_chunks()
+                continue
             if model == "run":
                 field_name = "runtime"
             elif model == "changelog":
@@ -1319,6 +1813,37 @@ class Controller:
             if text.lower() in str(node.get_properties().values()).lower()
         ]
 
+    def search_configurations(self, search, property="configuration", **kwargs):
+        if property not in vs.configuration_properties:
+            return {"error": f"'{property}' is not a configuration property."}
+        table, last_id, result = vs.models["device"], 0, {}
+        regex_match, context = kwargs.get("regex", False), kwargs.get("context", 0)
+        form = {
+            **kwargs.get("form", {}),
+            property: search,
+            f"{property}_filter": "regex" if regex_match else "inclusion",
+        }
+        constraints = self.filtering_base_constraints("device", form=form)
+        batch_size = db.transactions["import_batch_size"]
+        while True:
+            rows = (
+                db.query("device", "configuration", properties=["id", "name", property])
+                .filter(table.id > last_id, *constraints)
+                .order_by(table.id)
+                .limit(batch_size)
+                .all()
+            )
+            for _, name, value in rows:
+                value = db.load_configuration(value)
+                matches = table.get_search_matches(
+                    value, search, regex_match, int(context), raw=True
+                )
+                if matches:
+                    result[name] = matches
+            if len(rows) < batch_size:
+                return result
+            last_id = rows[-1].id
+
     def search_workflow_services(self, **kwargs):
         service_alias = aliased(vs.models["service"])
         workflows = [
@@ -1404,8 +1929,8 @@ class Controller:
                     info(f"{str(values)} could not be imported ({str(exc)})")
                     status = "Partial import (see logs)."
             db.session.commit()
-        for pool in db.fetch_all("pool", rbac="edit"):
-            pool.compute_pool()
+        if not db.pool_events:
+            vs.models["pool"].compute_pools(db.fetch_all("pool", rbac="edit"))
         env.log("info", status)
         return status
 
@@ -1441,42 +1966,193 @@ class Controller:
             return {"alert": str(exc)}
 
     def update_all_pools(self):
-        for pool in db.fetch_all("pool", rbac="edit"):
-            pool.compute_pool()
+        vs.models["pool"].compute_pools(db.fetch_all("pool", rbac="edit"))
+
+    def iter_git_log(self, repo, *args):
+        process, buffer = repo.git.log(*args, as_process=True), b""
+        for chunk in iter(lambda: process.stdout.read(65536), b""):
+            *tokens, buffer = (buffer + chunk).split(b"\0")
+            yield from (token.decode("utf-8").lstrip("\n") for token in tokens)
+        process.wait()
 
-    def update_database_configurations_from_git(self, force_update=False):
+    def update_git_history(self):
+        try:
+            with vs.git_history_lock:
+                self.index_git_history()
+        except Exception as exc:
+            db.session.rollback()
+            env.log("error", f"Update of the Git history index failed ({str(exc)})")
+
+    def index_git_history(self):
+        try:
+            repo = Repo(vs.path / "network_data")
+            head = repo.head.commit.hexsha
+        except Exception:
+            return
+        parameters = db.session.query(vs.models["parameters"]).with_for_update().first()
+        table = db.configuration_history_table
+        last_commit = parameters.git_history_commit
+        if last_commit == head:
+            db.session.commit()
+            return
+        try:
+            incremental = bool(last_commit) and repo.is_ancestor(last_commit, head)
+        except Exception:
+            incremental = False
+        if not incremental:
+            db.session.execute(table.delete())
+        env.log("info", f"Updating Git history index ({last_commit} -> {head})")
+        tokens = self.iter_git_log(
+            repo,
+            f"{last_commit}..{head}" if incremental else head,
+            "--reverse",
+            "--raw",
+            "--no-renames",
+            "--no-abbrev",
+            "-z",
+            "--format=%H %cI",
+        )
+        rows, batch_size = [], db.transactions["import_batch_size"]
+        commit = date = None
+        for token in tokens:
+            if token.startswith(":"):
+                blob, status = token.split()[3:5]
+                device, _, property = next(tokens).partition("/")
+                if property not in vs.configuration_properties:
+                    continue
+                rows.append(
+                    {
+                        "device": device,
+                        "property": property,
+                        "commit": commit,
+                        "date": date,
+                        "blob": None if status == "D" else blob,
+                    }
+                )
+                if len(rows) == batch_size:
+                    db.insert_ignore(table, rows, db.session)
+                    rows = []
+            elif token:
+                commit, date = token.split()
+        if rows:
+            db.insert_ignore(table, rows, db.session)
+        parameters.git_history_commit = head
+        db.session.commit()
+
+    def get_git_changed_devices(self, repo, commit, head):
+        try:
+            diff = repo.commit(commit).diff(head)
+        except Exception as exc:
+            env.log("warning", f"Incremental Git update not possible ({exc})")
+            return
+        return {
+            Path(path).parts[0]
+            for change in diff
+            for path in (change.a_path, change.b_path)
+            if path and len(Path(path).parts) > 1
+        }
+
+    def update_device_configurations_from_git(self, device, path, force_update):
+        try:
+            with open(path / "timestamps.json") as file:
+                timestamps = load(file)
+        except Exception:
+            timestamps = {}
+        updated = False
+        for property in vs.configuration_properties:
+            no_update = False
+            for timestamp, value in timestamps.get(property, {}).items():
+                if timestamp == "update":
+                    db_date = getattr(device, f"last_{property}_update")
+                    if db_date != "Never" and not force_update:
+                        no_update = vs.str_to_date(value) <= vs.str_to_date(db_date)
+                setattr(device, f"last_{property}_{timestamp}", value)
+            filepath = path / property
+            if not filepath.exists() or no_update:
+                continue
+            with open(filepath) as file:
+                updated |= device.update_configuration(property, file.read())
+        return updated
+
+    def update_database_configurations_from_git(
+        self, force_update=False, incremental=None
+    ):
         path = vs.path / "network_data"
         env.log("info", f"Updating device configurations with data from {path}")
-        for dir in scandir(path):
-            device = db.fetch("device", allow_none=True, name=dir.name)
-            timestamp_path = Path(dir.path) / "timestamps.json"
-            if not device:
-                continue
-            try:
-                with open(timestamp_path) as file:
-                    timestamps = load(file)
-            except Exception:
-                timestamps = {}
-            for property in vs.configuration_properties:
-                no_update = False
-                for timestamp, value in timestamps.get(property, {}).items():
-                    if timestamp == "update":
-                        db_date = getattr(device, f"last_{property}_update")
-                        if db_date != "Never" and not force_update:
-                            no_update = vs.str_to_date(value) <= vs.str_to_date(db_date)
-                    setattr(device, f"last_{property}_{timestamp}", value)
-                filepath = Path(dir.path) / property
-                if not filepath.exists() or no_update:
-                    continue
-                with open(filepath) as file:
-                    setattr(device, property, file.read())
+        if incremental is None:
+            incremental = vs.settings["app"]["git_incremental_update"]
+        parameters, device_names = db.fetch("parameters"), None
+        try:
+            repo = Repo(path)
+            head = repo.head.commit
+        except Exception:
+            head = None
+        if head and incremental and not force_update and parameters.git_commit:
+            if parameters.git_commit == head.hexsha:
+                device_names = set()
+            else:
+                device_names = self.get_git_changed_devices(
+                    repo, parameters.git_commit, head
+                )
+            if device_names is not None:
+                device_names |= set(parameters.git_pending_devices or [])
+                if not device_names:
+                    env.log("info", f"Commit {head.hexsha} already in the database")
+                    return self.update_git_history()
+        full_update = device_names is None
+        if full_update:
+            device_names = [
+                dir.name
+                for dir in scandir(path)
+                if dir.is_dir() and not dir.name.startswith(".")
+            ]
+        device_names, updated_devices = sorted(device_names), set()
+        pending_devices = set(device_names)
+        batch_size = db.transactions["import_batch_size"]
+        for index in range(0, len(device_names), batch_size):
+            names = device_names[index : index + batch_size]
+            query = db.query("device").filter(vs.models["device"].name.in_(names))
+            for device in query.all():
+                pending_devices.discard(device.name)
+                device_path = path / device.name
+                if self.update_device_configurations_from_git(
+                    device, device_path, force_update
+                ):
+                    updated_devices.add(device.id)
+        pending_devices = sorted(
+            name for name in pending_devices if (path / name).is_dir()
+        )
+        if pending_devices:
+            env.log(
+                "warning",
+                f"No device found for {len(pending_devices)} git directories "
+                f"({', '.join(pending_devices[:20])}): they will be read again "
+                "at the next update",
+            )
+        parameters.git_pending_devices = pending_devices
+        if head:
+            parameters.git_commit = head.hexsha
         db.session.commit()
-        for pool in db.fetch_all("pool"):
+        self.update_git_history()
+        env.log(
+            "info",
+            f"Configurations updated for {len(updated_devices)} devices "
+            f"({len(device_names)} {'directories' if full_update else 'changed'})",
+        )
+        if db.pool_events or not (full_update or updated_devices):
+            return
+        pools = [
+            pool
+            for pool in db.fetch_all("pool")
             if any(
                 getattr(pool, f"device_{property}")
                 for property in vs.configuration_properties
-            ):
-                pool.compute_pool()
+            )
+        ]
+        if full_update:
+            vs.models["pool"].compute_pools(pools)
+        else:
+            vs.models["pool"].update_object_pools("device", updated_devices, pools)
         db.session.commit()
 
     def update_device_rbac(self):
@@ -1491,6 +2167,9 @@ class Controller:
                     .all()
                 )
                 setattr(group, f"{property}_devices", devices)
+        if db.materialized_rbac:
+            db.session.flush()
+            db.update_rbac_access()
 
     def upload_files(self, **kwargs):
         path = f"{vs.file_path}/{kwargs['folder']}/{kwargs['file'].filename}"
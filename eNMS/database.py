@@ -1,7 +1,11 @@
 from ast import literal_eval
 from atexit import register
+from collections import Counter, defaultdict, OrderedDict
 from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, has_app_context
 from flask_login import current_user
+from hashlib import blake2b
 from importlib.util import module_from_spec, spec_from_file_location
 from json import loads
 from logging import error, info, warning
@@ -10,7 +14,9 @@ from os import getenv, getpid
 from os.path import exists
 from pathlib import Path
 from sqlalchemy import (
+    and_,
     Boolean,
+    cast,
     Column,
     create_engine,
     event,
@@ -18,38 +24,60 @@ from sqlalchemy import (
     Float,
     inspect,
     Integer,
+    literal,
+    or_,
     PickleType,
+    select,
     String,
     Table,
+    text,
     Text,
+    union,
+    UniqueConstraint,
 )
 from sqlalchemy.dialects.mysql.base import MSMediumBlob
-from sqlalchemy.exc import InvalidRequestError, OperationalError
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DBAPIError, InvalidRequestError, OperationalError
 from sqlalchemy.ext.associationproxy import AssociationProxyExtensionType
 from sqlalchemy.ext.declarative import declarative_base, DeclarativeMeta
 from sqlalchemy.ext.mutable import MutableDict, MutableList
 from sqlalchemy.orm import (
     configure_mappers,
+    object_session,
     relationship,
     scoped_session,
+    selectinload,
     sessionmaker,
 )
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlalchemy.orm.collections import InstrumentedList
 from sqlalchemy.types import JSON
-from time import sleep
+from threading import Lock
+from time import perf_counter, sleep
 from traceback import format_exc
 from uuid import getnode
+from zlib import crc32
 
 from eNMS.variables import vs
 
+migration_import = ContextVar("migration_import", default=False)
+query_trackers = ContextVar("query_trackers", default=())
+rbac_users = ContextVar("rbac_users", default=None)
+
 
 class Database:
+    chunk_marker = "\x1fchunks:"
+
     def __init__(self):
         for setting in vs.database.items():
             setattr(self, *setting)
         self.database_url = getenv("DATABASE_URL", "sqlite:///database.db")
         self.dialect = self.database_url.split(":")[0]
+        self.chunk_cache, self.chunk_cache_lock = OrderedDict(), Lock()
         self.rbac_error = type("RbacError", (Exception,), {})
+        self.query_budget_error = type("QueryBudgetError", (Exception,), {})
+        self.regex_error = type("RegexError", (Exception,), {})
         self.configure_columns()
         self.engine = create_engine(
             self.database_url,
@@ -78,14 +106,26 @@ class Database:
 
     def _initialize(self, env):
         self.register_custom_models()
-        try:
-            self.base.metadata.create_all(bind=self.engine)
-        except OperationalError:
-            info(f"Bypassing metadata creation for process {getpid()}")
+        spawned_process = env.detect_spawned_process()
+        if not spawned_process:
+            try:
+                self.base.metadata.create_all(bind=self.engine)
+            except OperationalError:
+                info(f"Bypassing metadata creation for process {getpid()}")
         configure_mappers()
+        postgresql = self.dialect.startswith("postgresql")
+        if self.columns["trigram_index"] and postgresql and not spawned_process:
+            self.create_trigram_index()
         self.configure_model_events(env)
-        if env.detect_cli():
+        if env.metrics_enabled:
+            self.configure_query_events(env)
+        if self.query_inspection["enabled"]:
+            self.configure_query_inspection()
+        if env.detect_cli() or spawned_process:
             return
+        if self.materialized_rbac:
+            self.update_rbac_access()
+            self.session.commit()
         first_init = not self.fetch("user", allow_none=True, name="admin")
         if first_init:
             admin_user = vs.models["user"](name="admin", is_admin=True)
@@ -138,6 +178,26 @@ class Database:
         self.session.commit()
         return first_init
 
+    def create_trigram_index(self):
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                for property in vs.configuration_properties:
+                    connection.execute(
+                        text(
+                            f"CREATE INDEX IF NOT EXISTS ix_device_{property}_trgm "
+                            f"ON device USING gin ({property} gin_trgm_ops)"
+                        )
+                    )
+                connection.execute(
+                    text(
+                        "CREATE INDEX IF NOT EXISTS ix_configuration_chunk_trgm "
+                        "ON configuration_chunk USING gin (content gin_trgm_ops)"
+                    )
+                )
+        except Exception as exc:
+            warning(f"Trigram index creation failed ({exc})")
+
     def create_metabase(self):
         class SubDeclarativeMeta(DeclarativeMeta):
             def __init__(cls, *args):  # noqa: N805
@@ -228,9 +288,113 @@ class Database:
                     "list": relation.uselist,
                 }
 
-    def configure_model_events(self, env):
-        env.log_events = True
+    def configure_query_events(self, env):
+        operations = ("select", "insert", "update", "delete")
+
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def start_query_timer(connection, cursor, statement, parameters, context, many):
+            connection.info["query_start"] = perf_counter()
+
+        @event.listens_for(self.engine, "after_cursor_execute")
+        def observe_query(connection, cursor, statement, parameters, context, many):
+            operation = statement.lstrip()[:6].lower()
+            env.observe(
+                "enms_database_query_duration_seconds",
+                perf_counter() - connection.info["query_start"],
+                operation=operation if operation in operations else "other",
+            )
+
+    def configure_query_inspection(self):
+        @event.listens_for(self.engine, "before_cursor_execute")
+        def count_query(connection, cursor, statement, parameters, context, many):
+            trackers = query_trackers.get()
+            if not trackers:
+                return
+            with trackers[-1]["lock"]:
+                trackers[-1]["statements"][statement] += 1
+
+        @event.listens_for(self.session, "before_commit")
+        def check_request_budget(session):
+            trackers = query_trackers.get()
+            if not trackers or trackers[-1]["scope"] != "request":
+                return
+            session.flush()
+            self.check_query_budget("request")
+
+    @contextmanager
+    def inspect_queries(self, name, scope):
+        if not self.query_inspection["enabled"]:
+            yield None
+            return
+        tracker = {
+            "name": name,
+            "scope": scope,
+            "lock": Lock(),
+            "statements": Counter(),
+        }
+        token = query_trackers.set(query_trackers.get() + (tracker,))
+        try:
+            yield tracker
+        finally:
+            query_trackers.reset(token)
+
+    def check_query_budget(self, scope):
+        trackers = (
+            tracker for tracker in query_trackers.get() if tracker["scope"] == scope
+        )
+        query_report, budget_exceeded = self.query_report(next(trackers, None))
+        if budget_exceeded:
+            raise self.query_budget_error(query_report)
+
+    def query_report(self, tracker):
+        if not tracker:
+            return None, False
+        with tracker["lock"]:
+            statements = tracker["statements"].copy()
+        count = sum(statements.values())
+        budget = self.query_inspection[f"{tracker['scope']}_budget"]
+        repeated_statements = [
+            (statement, number)
+            for statement, number in statements.most_common(5)
+            if number >= self.query_inspection["repeated_statements"]
+        ]
+        if count <= budget and not repeated_statements:
+            return None, False
+        report = f"QUERY INSPECTION ({tracker['name']}): {count} SQL statements"
+        report += f" (budget: {budget})"
+        for statement, number in repeated_statements:
+            report += f"\n{number} x {' '.join(statement.split())[:300]}"
+        return report, count > budget and self.query_inspection["raise_error"]
+
+    @property
+    def importing(self):
+        return migration_import.get()
+
+    @property
+    def pool_events(self):
+        return vs.settings["pools"]["incremental_update"] and not self.importing
+
+    @property
+    def materialized_rbac(self):
+        return vs.settings["security"]["materialized_rbac"] and not self.importing
+
+    @contextmanager
+    def rbac_scope(self):
+        token = rbac_users.set({})
+        try:
+            yield
+        finally:
+            rbac_users.reset(token)
 
+    @contextmanager
+    def import_scope(self):
+        token = migration_import.set(True)
+        try:
+            yield
+        finally:
+            migration_import.reset(token)
+
+    def configure_model_events(self, env):
         @event.listens_for(self.base, "after_insert", propagate=True)
         def log_instance_creation(mapper, connection, target):
             if not getattr(target, "log_change", True) or not env.log_events:
@@ -285,6 +449,30 @@ class Database:
                 )
                 env.log("info", f"UPDATE: {target.type} '{name}': ({changes})")
 
+        @event.listens_for(self.base, "after_insert", propagate=True)
+        @event.listens_for(self.base, "after_delete", propagate=True)
+        def queue_rbac_creation(mapper, connection, target):
+            self.queue_rbac_update(target)
+
+        @event.listens_for(self.base, "after_update", propagate=True)
+        def queue_rbac_update(mapper, connection, target):
+            self.queue_rbac_update(target, check_history=True)
+
+        @event.listens_for(self.session, "after_flush_postexec")
+        def update_rbac_access(session, flush_context):
+            refresh = session.info.pop("rbac_refresh", False)
+            rbac_updates = session.info.pop("rbac_updates", {})
+            if refresh:
+                return self.update_rbac_access(connection=session.connection())
+            for model, instance_ids in rbac_updates.items():
+                if len(instance_ids) > self.transactions["import_batch_size"]:
+                    instance_ids = None
+                self.update_rbac_access(model, instance_ids, session.connection())
+
+        self.configure_configuration_digests()
+        if self.configuration_storage["deduplication"]:
+            self.configure_configuration_events()
+
         for model in vs.models.values():
             if "configure_events" in vars(model):
                 model.configure_events()
@@ -307,6 +495,80 @@ class Database:
                         )
                         env.vault_client.delete(f"{path}/{old_name}")
 
+    def configure_configuration_digests(self):
+        for property in vs.configuration_properties:
+
+            @event.listens_for(
+                getattr(vs.models["device"], property), "set", propagate=True
+            )
+            def update_digest(target, value, oldvalue, initiator):
+                if value and value.startswith(self.chunk_marker):
+                    return
+                digest = self.get_digest(value or "")
+                setattr(target, f"{initiator.key}_digest", digest)
+
+    def configure_configuration_events(self):
+        @event.listens_for(vs.models["device"], "load", propagate=True)
+        def load_configuration(target, context):
+            self.load_configuration_properties(target)
+
+        @event.listens_for(vs.models["device"], "refresh", propagate=True)
+        def refresh_configuration(target, context, attrs):
+            self.load_configuration_properties(target, attrs)
+
+        @event.listens_for(self.session, "before_flush")
+        def store_configurations(session, flush_context, instances):
+            locked = False
+            for instance in (*session.new, *session.dirty):
+                if not isinstance(instance, vs.models["device"]):
+                    continue
+                state = inspect(instance)
+                for property in vs.configuration_properties:
+                    history = state.attrs[property].history
+                    if not history.added:
+                        continue
+                    value, digests = history.added[0] or "", []
+                    if value.startswith(self.chunk_marker):
+                        continue
+                    if value:
+                        if not locked:
+                            self.lock_parameters(session.connection(), True)
+                            locked = True
+                        manifest, digests = self.store_configuration(
+                            value, session.connection()
+                        )
+                        setattr(instance, property, manifest)
+                    session_configurations = session.info.setdefault(
+                        "configurations", []
+                    )
+                    session_configurations.append((instance, property, value, digests))
+
+        @event.listens_for(self.session, "after_flush_postexec")
+        def update_chunk_associations(session, flush_context):
+            table = self.configuration_chunk_association_table
+            connection = session.connection()
+            for instance, property, value, digests in session.info.pop(
+                "configurations", []
+            ):
+                connection.execute(
+                    table.delete().where(
+                        table.c.device_id == instance.id, table.c.property == property
+                    )
+                )
+                if digests:
+                    connection.execute(
+                        table.insert(),
+                        [
+                            {
+                                "device_id": instance.id,
+                                "property": property,
+                                "digest": digest,
+                            }
+                            for digest in digests
+                        ],
+                    )
+                set_committed_value(instance, property, value)
+
     def configure_associations(self):
         for name, association in self.relationships["associations"].items():
             model1, model2 = association["model1"], association["model2"]
@@ -350,6 +612,27 @@ class Database:
                     Column("user_id", Integer, ForeignKey("user.id"), primary_key=True),
                 ),
             )
+            setattr(
+                self,
+                f"{model}_access_table",
+                Table(
+                    f"{model}_access",
+                    self.base.metadata,
+                    Column(
+                        "user_id",
+                        Integer,
+                        ForeignKey("user.id", ondelete="cascade"),
+                        primary_key=True,
+                    ),
+                    Column("access", self.TinyString, primary_key=True),
+                    Column(
+                        f"{model}_id",
+                        Integer,
+                        ForeignKey(f"{model}.id", ondelete="cascade"),
+                        primary_key=True,
+                    ),
+                ),
+            )
             for property in properties:
                 setattr(
                     self,
@@ -393,6 +676,63 @@ class Database:
                 ),
             )
 
+        self.configuration_chunk_table = Table(
+            "configuration_chunk",
+            self.base.metadata,
+            Column("digest", String(32), primary_key=True),
+            Column("content", self.LargeString),
+        )
+        self.configuration_chunk_association_table = Table(
+            "configuration_chunk_association",
+            self.base.metadata,
+            Column(
+                "device_id",
+                Integer,
+                ForeignKey("device.id", ondelete="cascade"),
+                primary_key=True,
+            ),
+            Column("property", self.TinyString, primary_key=True),
+            Column("digest", String(32), primary_key=True, index=True),
+        )
+        self.configuration_history_table = Table(
+            "configuration_history",
+            self.base.metadata,
+            Column("id", Integer, primary_key=True),
+            Column("device", self.SmallString, index=True),
+            Column("property", self.TinyString),
+            Column("commit", String(40), index=True),
+            Column("date", self.TinyString),
+            Column("blob", String(40)),
+            UniqueConstraint("device", "property", "commit"),
+        )
+
+    def get_rbac_user(self, username=None):
+        if current_user and not current_user.is_authenticated:
+            return {"rbac": False}
+        name = getattr(current_user, "name", None) or username or "admin"
+        cache = rbac_users.get()
+        if cache is None:
+            cache = g.setdefault("rbac_users", {}) if has_app_context() else {}
+        if name not in cache:
+            user = (
+                current_user
+                or self.session.query(vs.models["user"]).filter_by(name=name).first()
+            )
+            if not user:
+                return
+            cache[name] = {
+                "id": user.id,
+                "groups": [group.id for group in user.groups],
+                "rbac": not user.is_admin,
+            }
+        return cache[name]
+
+    def clear_rbac_cache(self):
+        if rbac_users.get() is not None:
+            rbac_users.get().clear()
+        if has_app_context():
+            g.pop("rbac_users", None)
+
     def query(self, model, rbac="read", username=None, properties=None):
         if properties:
             entity = [getattr(vs.models[model], property) for property in properties]
@@ -400,20 +740,290 @@ class Database:
             entity = [vs.models[model]]
         query = self.session.query(*entity)
         if rbac:
-            user = (
-                current_user
-                or self.session.query(vs.models["user"])
-                .filter_by(name=username or "admin")
-                .first()
-            )
+            user = self.get_rbac_user(username)
             if not user:
                 return
-            if user.is_authenticated and not user.is_admin:
+            if user["rbac"]:
                 if model in vs.rbac["admin_models"].get(rbac, []):
                     raise self.rbac_error
                 query = vs.models[model].rbac_filter(query, rbac, user)
         return query
 
+    @staticmethod
+    def get_digest(value):
+        return blake2b(value.encode("utf-8"), digest_size=16).hexdigest()
+
+    def split_configuration(self, value):
+        chunks, chunk, size = [], [], self.configuration_storage["chunk_size"]
+        for line in value.splitlines(keepends=True):
+            chunk.append(line)
+            if not crc32(line.encode("utf-8")) % size or len(chunk) >= 4 * size:
+                chunks.append("".join(chunk))
+                chunk = []
+        if chunk:
+            chunks.append("".join(chunk))
+        return chunks
+
+    def insert_ignore(self, table, rows, connection):
+        if self.dialect.startswith(("mariadb", "mysql")):
+            statement = table.insert().prefix_with("IGNORE")
+        elif self.dialect.startswith("postgresql"):
+            statement = postgresql_insert(table).on_conflict_do_nothing()
+        else:
+            statement = sqlite_insert(table).on_conflict_do_nothing()
+        connection.execute(statement, rows)
+
+    def lock_parameters(self, connection, read=False):
+        parameters = vs.models["parameters"].__table__
+        connection.execute(select(parameters.c.id).with_for_update(read=read))
+
+    def store_configuration(self, value, connection):
+        table = self.configuration_chunk_table
+        batch_size = self.transactions["import_batch_size"]
+        chunks = {
+            self.get_digest(chunk): chunk for chunk in self.split_configuration(value)
+        }
+        digests, unique_digests = list(chunks), list(set(chunks))
+        for index in range(0, len(unique_digests), batch_size):
+            batch = unique_digests[index : index + batch_size]
+            existing_digests = {
+                digest
+                for digest, in connection.execute(
+                    select(table.c.digest).where(table.c.digest.in_(batch))
+                )
+            }
+            rows = [
+                {"digest": digest, "content": chunks[digest]}
+                for digest in batch
+                if digest not in existing_digests
+            ]
+            if rows:
+                self.insert_ignore(table, rows, connection)
+        manifest = f"{self.chunk_marker}{self.get_digest(value)}:{','.join(digests)}"
+        return manifest, unique_digests
+
+    def load_configuration(self, value, connection=None):
+        if not isinstance(value, str) or not value.startswith(self.chunk_marker):
+            return value
+        table, cache = self.configuration_chunk_table, self.chunk_cache
+        batch_size = self.transactions["import_batch_size"]
+        digests = value[len(self.chunk_marker) :].split(":")[1].split(",")
+        chunks = {}
+        with self.chunk_cache_lock:
+            for digest in set(digests):
+                if digest in cache:
+                    cache.move_to_end(digest)
+                    chunks[digest] = cache[digest]
+        missing_digests = [digest for digest in set(digests) if digest not in chunks]
+        for index in range(0, len(missing_digests), batch_size):
+            batch = missing_digests[index : index + batch_size]
+            query = select(table.c.digest, table.c.content).where(
+                table.c.digest.in_(batch)
+            )
+            chunks.update((connection or self.session).execute(query).all())
+        cache_size = self.configuration_storage["cache_size"]
+        with self.chunk_cache_lock:
+            for digest in missing_digests:
+                if digest in chunks:
+                    cache[digest] = chunks[digest]
+            while len(cache) > cache_size:
+                cache.popitem(last=False)
+        missing_chunks = set(digests) - set(chunks)
+        if missing_chunks:
+            error(f"Configuration chunks not found: {', '.join(missing_chunks)}")
+        return "".join(chunks.get(digest, "") for digest in digests)
+
+    def load_configuration_properties(self, instance, properties=None):
+        session = object_session(instance)
+        for property in properties or vs.configuration_properties:
+            if property not in vs.configuration_properties:
+                continue
+            value = instance.__dict__.get(property)
+            if isinstance(value, str) and value.startswith(self.chunk_marker):
+                value = self.load_configuration(value, session)
+                set_committed_value(instance, property, value)
+
+    def get_configuration_constraint(self, row, property, value, filter_value):
+        if filter_value == "equality":
+            digest = self.get_digest(value)
+            return or_(row == value, row.startswith(f"{self.chunk_marker}{digest}:"))
+        inclusion = not filter_value or filter_value == "inclusion"
+        if inclusion:
+            text_match = row.contains(value, autoescape=True)
+        else:
+            text_match = cast(row, String()).regexp_match(value)
+        if inclusion and value.splitlines() == [value]:
+            device_ids = self.get_chunk_devices(property, value)
+        else:
+            device_ids = self.get_chunked_configuration_matches(
+                row, property, value, inclusion
+            )
+        return or_(
+            vs.models["device"].id.in_(device_ids),
+            and_(~row.startswith(self.chunk_marker), text_match),
+        )
+
+    def get_chunk_devices(self, property, value):
+        chunk_table = self.configuration_chunk_table
+        association_table = self.configuration_chunk_association_table
+        return (
+            select(association_table.c.device_id)
+            .join(chunk_table, chunk_table.c.digest == association_table.c.digest)
+            .where(
+                association_table.c.property == property,
+                chunk_table.c.content.contains(value, autoescape=True),
+            )
+        )
+
+    @staticmethod
+    def get_regex_literal(pattern):
+        if any(special in pattern for special in ("|", "(?", "[:", "[=", "[.")):
+            return ""
+        runs, run, depth, index = [], "", 0, 0
+        while index < len(pattern):
+            character = pattern[index]
+            if character.isalnum() or character == " ":
+                if not depth:
+                    run += character
+                index += 1
+                continue
+            if character in "?*{":
+                run = run[:-1]
+            runs.append(run)
+            run = ""
+            if character == "\\":
+                index += 1
+                if index < len(pattern) and pattern[index].isalnum():
+                    while index < len(pattern) and pattern[index].isalnum():
+                        index += 1
+                    continue
+            elif character == "[":
+                index += 2 if pattern[index + 1 : index + 2] == "^" else 1
+                index = pattern.find("]", index + 1)
+                if index == -1:
+                    return ""
+            elif character in "()":
+                depth += 1 if character == "(" else -1
+            index += 1
+        return max(runs + [run], key=len)
+
+    def get_chunked_configuration_matches(self, row, property, value, inclusion):
+        model, device_ids, last_id = vs.models["device"], [], 0
+        batch_size = self.configuration_storage["search_batch_size"]
+        if inclusion:
+            required_text = max(value.splitlines(), key=len, default="")
+        else:
+            required_text = self.get_regex_literal(value)
+        query = self.session.query(model.id, row).filter(
+            row.startswith(self.chunk_marker)
+        )
+        if required_text:
+            query = query.filter(
+                model.id.in_(self.get_chunk_devices(property, required_text))
+            )
+        while True:
+            rows = (
+                query.filter(model.id > last_id)
+                .order_by(model.id)
+                .limit(batch_size)
+                .all()
+            )
+            if rows:
+                device_ids.extend(self.match_configurations(rows, value, inclusion))
+            if len(rows) < batch_size:
+                return device_ids
+            last_id = rows[-1][0]
+
+    def match_configurations(self, rows, value, inclusion):
+        matches = []
+        for _, manifest in rows:
+            configuration = literal(self.load_configuration(manifest), Text())
+            if inclusion:
+                matches.append(configuration.contains(value, autoescape=True))
+            else:
+                matches.append(configuration.regexp_match(value))
+        try:
+            with self.session.begin_nested():
+                results = self.session.execute(select(*matches)).one()
+        except DBAPIError as exc:
+            if inclusion:
+                raise
+            raise self.regex_error(str(exc.orig))
+        return [device_id for (device_id, _), match in zip(rows, results) if match]
+
+    def delete_unused_chunks(self):
+        self.lock_parameters(self.session.connection())
+        association_table = self.configuration_chunk_association_table
+        device_ids = select(vs.models["device"].id)
+        self.session.execute(
+            association_table.delete().where(
+                association_table.c.device_id.not_in(device_ids)
+            )
+        )
+        self.session.execute(
+            self.configuration_chunk_table.delete().where(
+                self.configuration_chunk_table.c.digest.not_in(
+                    select(association_table.c.digest)
+                )
+            )
+        )
+        self.session.commit()
+
+    def queue_rbac_update(self, instance, check_history=False):
+        model, state = getattr(instance, "class_type", None), inspect(instance)
+        if model in ("group", "user"):
+            self.clear_rbac_cache()
+        if not self.materialized_rbac:
+            return
+        session_info = object_session(instance).info
+        if model in ("group", "user"):
+            relation = "users" if model == "group" else "groups"
+            if not check_history or state.attrs[relation].history.has_changes():
+                session_info["rbac_refresh"] = True
+        elif model in vs.rbac["rbac_models"]:
+            properties = ("owners", *vs.rbac["rbac_models"][model])
+            if check_history and not any(
+                state.attrs[property].history.has_changes() for property in properties
+            ):
+                return
+            rbac_updates = session_info.setdefault("rbac_updates", defaultdict(set))
+            rbac_updates[model].add(instance.id)
+
+    def update_rbac_access(self, model=None, instance_ids=None, connection=None):
+        connection = connection or self.session
+        if instance_ids is None:
+            self.lock_parameters(connection)
+        for model in [model] if model else vs.rbac["rbac_models"]:
+            table, column = getattr(self, f"{model}_access_table"), f"{model}_id"
+            owner_table = getattr(self, f"{model}_owner_table")
+            delete_statement = table.delete()
+            if instance_ids is not None:
+                delete_statement = delete_statement.where(
+                    table.c[column].in_(instance_ids)
+                )
+            connection.execute(delete_statement)
+            for property in vs.rbac["rbac_models"][model]:
+                group_table = getattr(self, f"{model}_{property}_table")
+                owners = select(
+                    owner_table.c.user_id, literal(property), owner_table.c[column]
+                )
+                groups = select(
+                    self.user_group_table.c.user_id,
+                    literal(property),
+                    group_table.c[column],
+                ).join(
+                    group_table,
+                    group_table.c.group_id == self.user_group_table.c.group_id,
+                )
+                if instance_ids is not None:
+                    owners = owners.where(owner_table.c[column].in_(instance_ids))
+                    groups = groups.where(group_table.c[column].in_(instance_ids))
+                connection.execute(
+                    table.insert().from_select(
+                        ["user_id", "access", column], union(owners, groups)
+                    )
+                )
+
     def fetch(
         self,
         instance_type,
@@ -485,6 +1095,31 @@ class Database:
             for instance in self.fetch_all(model)
         ]
 
+    def stream_export(self, model, private_properties=False):
+        table, last_id = vs.models[model], 0
+        no_migrate = self.dont_migrate.get(model, {})
+        options = [
+            selectinload(getattr(table, property))
+            for property in vs.relationships[model]
+            if property not in no_migrate
+        ]
+        while True:
+            instances = (
+                self.query(model)
+                .filter(table.id > last_id)
+                .order_by(table.id)
+                .options(*options)
+                .limit(self.transactions["import_batch_size"])
+                .all()
+            )
+            if not instances:
+                return
+            for instance in instances:
+                yield instance.to_dict(
+                    export=True, private_properties=private_properties
+                )
+            last_id = instances[-1].id
+
     def factory(self, _class, commit=False, no_fetch=False, rbac="edit", **kwargs):
         def transaction(_class, **kwargs):
             property = "path" if _class in ("file", "folder") else "name"
@@ -1,4 +1,5 @@
 from base64 import b64decode, b64encode
+from bisect import bisect_left
 from click import get_current_context
 from collections import defaultdict
 from cryptography.fernet import Fernet
@@ -10,9 +11,10 @@ from email.mime.text import MIMEText
 from email.utils import formatdate
 from flask_login import current_user
 from importlib import import_module
-from json import load
+from json import dumps, load
 from logging.config import dictConfig
 from logging import getLogger, info
+from multiprocessing import current_process
 from os import getenv, getpid
 from passlib.hash import argon2
 from pathlib import Path
@@ -26,7 +28,8 @@ from smtplib import SMTP
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.exc import StaleDataError
 from sys import path as sys_path
-from threading import Thread
+from threading import Lock, Thread
+from time import sleep
 from traceback import format_exc
 from warnings import warn
 from watchdog.observers.polling import PollingObserver
@@ -61,14 +64,16 @@ class Environment:
         if vs.settings["paths"]["custom_code"]:
             sys_path.append(vs.settings["paths"]["custom_code"])
         self.init_logs()
+        self.init_metrics()
         self.init_redis()
         if vs.settings["automation"]["use_task_queue"]:
             self.init_dramatiq()
         self.init_connection_pools()
         Path(vs.settings["files"]["trash"]).mkdir(parents=True, exist_ok=True)
-        main_thread = Thread(target=self.monitor_filesystem)
-        main_thread.daemon = True
-        main_thread.start()
+        if not self.detect_spawned_process():
+            main_thread = Thread(target=self.monitor_filesystem)
+            main_thread.daemon = True
+            main_thread.start()
         self.ssh_port = -1
 
     def monitor_filesystem(self):
@@ -137,12 +142,19 @@ class Environment:
                 db.session.commit()
             return user
 
+    @property
+    def log_events(self):
+        return not db.importing
+
     def detect_cli(self):
         try:
             return get_current_context().info_name == "flask"
         except RuntimeError:
             return False
 
+    def detect_spawned_process(self):
+        return getattr(current_process(), "_inheriting", False)
+
     def encrypt_password(self, password):
         if isinstance(password, str):
             password = str.encode(password)
@@ -216,8 +228,17 @@ class Environment:
             log_level = getattr(import_module("logging"), log_level.upper())
             getLogger(logger).setLevel(log_level)
 
+    def init_metrics(self):
+        self.metrics_enabled = vs.settings["metrics"]["enabled"]
+        self.metrics_buckets = vs.settings["metrics"]["buckets"]
+        self.metrics_lock = Lock()
+        self.counters, self.histograms = defaultdict(float), {}
+
     def init_redis(self):
         host = getenv("REDIS_ADDR")
+        self.redis_buffer, self.redis_increments = [], {}
+        self.redis_lock, self.redis_flush_lock = Lock(), Lock()
+        self.redis_flusher_pid = None
         if not host:
             self.redis_queue = None
         else:
@@ -232,6 +253,49 @@ class Environment:
             keys = [getenv(f"UNSEAL_VAULT_KEY{index}") for index in range(1, 6)]
             self.vault_client.sys.submit_unseal_keys(filter(None, keys))
 
+    def get_metrics(self, gauges=None, counters=None):
+        worker, metrics = str(getpid()), defaultdict(list)
+
+        def format_labels(labels, **extra):
+            labels = ",".join(
+                f'{key}="{dumps(str(value), ensure_ascii=False)[1:-1]}"'
+                for key, value in {**dict(labels), **extra}.items()
+            )
+            return f"{{{labels}}}" if labels else ""
+
+        with self.metrics_lock:
+            counters = list(self.counters.items()) + list((counters or {}).items())
+            histograms = [
+                (key, list(buckets), total, count)
+                for key, (buckets, total, count) in self.histograms.items()
+            ]
+        for (metric, labels), value in counters:
+            labels = format_labels(labels, worker=worker)
+            metrics[(metric, "counter")].append(f"{metric}{labels} {value}")
+        for (metric, labels), buckets, total, count in histograms:
+            cumulative_count = 0
+            for bound, bucket_count in zip(self.metrics_buckets + ["+Inf"], buckets):
+                cumulative_count += bucket_count
+                bucket_labels = format_labels(labels, worker=worker, le=bound)
+                metrics[(metric, "histogram")].append(
+                    f"{metric}_bucket{bucket_labels} {cumulative_count}"
+                )
+            labels = format_labels(labels, worker=worker)
+            metrics[(metric, "histogram")].extend(
+                (
+                    f"{metric}_sum{labels} {total}",
+                    f"{metric}_count{labels} {count}",
+                )
+            )
+        for (metric, labels), value in (gauges or {}).items():
+            metrics[(metric, "gauge")].append(
+                f"{metric}{format_labels(labels)} {value}"
+            )
+        lines = []
+        for (metric, metric_type), samples in sorted(metrics.items()):
+            lines.extend((f"# TYPE {metric} {metric_type}", *samples))
+        return "\n".join(lines) + "\n"
+
     def get_workers(self):
         return {worker.name: worker.to_dict() for worker in db.fetch_all("worker")}
 
@@ -255,8 +319,9 @@ class Environment:
             key = f"{runtime}/{service}/logs"
             vs.run_logs[runtime][int(service)] = None
             if mode == "add":
-                log = self.redis("lpush", key, log)
+                log = self.redis_write("lpush", key, log)
             else:
+                self.flush_redis()
                 log = self.redis("lrange", key, 0, -1)
                 if log:
                     log = log[::-1][start_line:]
@@ -268,12 +333,99 @@ class Environment:
                 log = full_log[start_line:]
         return log
 
+    def increment(self, metric, value=1, **labels):
+        if not self.metrics_enabled:
+            return
+        key = (metric, tuple(sorted(labels.items())))
+        with self.metrics_lock:
+            self.counters[key] += value
+
+    def observe(self, metric, value, **labels):
+        if not self.metrics_enabled:
+            return
+        key = (metric, tuple(sorted(labels.items())))
+        index = bisect_left(self.metrics_buckets, value)
+        with self.metrics_lock:
+            if key not in self.histograms:
+                self.histograms[key] = [[0] * (len(self.metrics_buckets) + 1), 0.0, 0]
+            histogram = self.histograms[key]
+            histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
     def redis(self, operation, *args, **kwargs):
+        self.increment("enms_redis_round_trips_total", operation=operation)
         try:
             return getattr(self.redis_queue, operation)(*args, **kwargs)
         except (ConnectionError, TimeoutError) as exc:
             self.log("error", f"Redis Queue Unreachable ({exc})", change_log=False)
 
+    def redis_write(self, operation, key, value):
+        settings = vs.settings["redis"]["write_buffer"]
+        if not settings["enabled"]:
+            return self.redis(operation, key, value)
+        with self.redis_lock:
+            if self.redis_flusher_pid != getpid():
+                self.redis_buffer, self.redis_increments = [], {}
+                self.redis_flusher_pid = getpid()
+                Thread(target=self.flush_redis_periodically, daemon=True).start()
+            index = self.redis_increments.get(key) if operation == "incr" else None
+            if index is not None:
+                self.redis_buffer[index][2] += value
+            else:
+                if operation == "incr":
+                    self.redis_increments[key] = len(self.redis_buffer)
+                else:
+                    self.redis_increments.pop(key, None)
+                self.redis_buffer.append([operation, key, value])
+            flush = len(self.redis_buffer) >= settings["batch_size"]
+        if flush:
+            self.flush_redis()
+
+    def flush_redis(self):
+        if not self.redis_queue:
+            return
+        with self.redis_flush_lock:
+            with self.redis_lock:
+                buffer, self.redis_buffer = self.redis_buffer, []
+                self.redis_increments = {}
+            if not buffer:
+                return
+            pipeline = self.redis_queue.pipeline(transaction=False)
+            for operation, key, value in buffer:
+                getattr(pipeline, operation)(key, value)
+            self.increment("enms_redis_round_trips_total", operation="pipeline")
+            try:
+                pipeline.execute()
+            except (ConnectionError, TimeoutError) as exc:
+                self.log("error", f"Redis Queue Unreachable ({exc})", change_log=False)
+
+    def flush_redis_periodically(self):
+        pid = getpid()
+        while self.redis_flusher_pid == pid:
+            sleep(vs.settings["redis"]["write_buffer"]["flush_interval"])
+            self.flush_redis()
+
+    def redis_scan(self, pattern):
+        self.increment("enms_redis_round_trips_total", operation="scan")
+        try:
+            return list(self.redis_queue.scan_iter(pattern, count=1000))
+        except (ConnectionError, TimeoutError) as exc:
+            self.log("error", f"Redis Queue Unreachable ({exc})", change_log=False)
+            return []
+
+    def redis_mget(self, keys):
+        batch_size = vs.settings["redis"]["write_buffer"]["batch_size"]
+        pipeline = self.redis_queue.pipeline(transaction=False)
+        for index in range(0, len(keys), batch_size):
+            pipeline.mget(keys[index : index + batch_size])
+        self.increment("enms_redis_round_trips_total", operation="pipeline")
+        try:
+            return [value for values in pipeline.execute() for value in values]
+        except (ConnectionError, TimeoutError) as exc:
+            self.log("error", f"Redis Queue Unreachable ({exc})", change_log=False)
+            return [None] * len(keys)
+
     def send_email(
         self,
         subject,
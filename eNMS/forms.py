@@ -400,9 +400,14 @@ class DatabaseMigrationsForm(BaseForm):
     skip_pool_update = BooleanField(
         "Skip the Pool update after Import", default="checked"
     )
+    streaming_import = BooleanField("Streaming Import")
     export_private_properties = BooleanField(
         "Include private properties", default="checked"
     )
+    export_format = SelectField(
+        "Export Format",
+        choices=(("yaml", "YAML"), ("jsonl", "Compressed JSON Lines")),
+    )
     export_choices = vs.dualize(db.import_export_models)
     import_export_types = SelectMultipleField(
         "Instances to migrate", choices=export_choices
@@ -599,7 +604,11 @@ class ResultLogDeletionForm(BaseForm):
     form_type = HiddenField(default="result_log_deletion")
     deletion_types = SelectMultipleField(
         "Instances do delete",
-        choices=[("run", "result"), ("changelog", "changelog")],
+        choices=[
+            ("run", "result"),
+            ("changelog", "changelog"),
+            ("configuration_chunk", "unused configuration chunk"),
+        ],
     )
     date_time = StringField(type="date", label="Delete Records before")
 
@@ -699,6 +708,7 @@ class ServiceForm(BaseForm):
     target_pools = MultipleInstanceField("Pools", model="pool")
     update_target_pools = BooleanField("Update target pools before running")
     update_pools_after_running = BooleanField("Update pools after running")
+    profiling = BooleanField("Profiling (timings per device and phase)")
     workflows = MultipleInstanceField("Workflows", model="workflow")
     waiting_time = IntegerField(
         "Time to Wait before next service is started (in seconds)", default=0
@@ -818,6 +828,11 @@ class ServiceForm(BaseForm):
     )
     multiprocessing = BooleanField("Multiprocessing", help="common/multiprocessing")
     max_processes = IntegerField("Maximum number of processes", default=15)
+    multiprocessing_method = SelectField(
+        "Multiprocessing Method",
+        choices=(("thread", "Thread Pool"), ("asyncio", "Asyncio Event Loop")),
+        no_search=True,
+    )
     validation_condition = SelectField(
         choices=(
             ("none", "No validation"),
@@ -884,6 +899,7 @@ class ServiceForm(BaseForm):
             "log_level",
             "disable_result_creation",
             "update_pools_after_running",
+            "profiling",
         ],
         "step1-2": [
             "mandatory_parametrization",
@@ -906,6 +922,7 @@ class ServiceForm(BaseForm):
             "device_query_property",
             "multiprocessing",
             "max_processes",
+            "multiprocessing_method",
         ],
         "step3-2": [
             "iteration_devices",
@@ -993,13 +1010,15 @@ class ServiceForm(BaseForm):
                 f"The validation method is set to '{self.validation_method.data}'"
                 f" and the matching value is empty: these do no match."
             )
-        too_many_threads_error = (
-            self.max_processes.data > vs.settings["automation"]["max_process"]
-        )
+        is_async = self.multiprocessing_method.data == "asyncio"
+        max_process = vs.settings["automation"][
+            "max_async_jobs" if is_async else "max_process"
+        ]
+        too_many_threads_error = self.max_processes.data > max_process
         if too_many_threads_error:
             self.max_processes.errors.append(
-                "The number of threads used for multiprocessing must be "
-                f"less than {vs.settings['automation']['max_process']}."
+                f"The number of {'jobs' if is_async else 'threads'} used for "
+                f"multiprocessing must be less than {max_process}."
             )
         shared_service_error = not self.shared.data and len(self.workflows.data) > 1
         if shared_service_error:
@@ -226,6 +226,9 @@ class Parameters(AbstractBase):
     banner_active = db.Column(Boolean)
     banner_deactivate_on_restart = db.Column(Boolean)
     banner_properties = db.Column(db.Dict)
+    git_commit = db.Column(db.TinyString)
+    git_pending_devices = db.Column(db.List)
+    git_history_commit = db.Column(db.TinyString)
 
 
 class File(AbstractBase):
@@ -1,10 +1,13 @@
 from copy import deepcopy
+from datetime import datetime
 from flask_login import current_user
 from functools import wraps
 from os import environ, getpid
+from pathlib import Path
+from re import M, sub
 from requests import get, post
 from requests.exceptions import ConnectionError, MissingSchema, ReadTimeout
-from sqlalchemy import Boolean, case, ForeignKey, Integer
+from sqlalchemy import Boolean, case, Float, ForeignKey, Integer
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import deferred, relationship
@@ -108,7 +111,9 @@ class Service(AbstractBase):
     )
     maximum_runs = db.Column(Integer, default=1)
     multiprocessing = db.Column(Boolean, default=False)
+    profiling = db.Column(Boolean, default=False)
     max_processes = db.Column(Integer, default=5)
+    multiprocessing_method = db.Column(db.TinyString, default="thread")
     status = db.Column(db.TinyString, default="Idle")
     validation_condition = db.Column(db.TinyString, default="none")
     conversion_method = db.Column(db.TinyString, default="none")
@@ -216,6 +221,9 @@ class Service(AbstractBase):
             if edge.subtype == subtype and edge.workflow.name == workflow.name:
                 yield edge
 
+    def supports_asyncio(self, run):
+        return hasattr(self, "async_job")
+
 
 class ConnectionService(Service):
     __tablename__ = "connection_service"
@@ -232,6 +240,83 @@ class ConnectionService(Service):
     __mapper_args__ = {"polymorphic_identity": "connection_service"}
 
 
+class ConfigurationBackupMixin:
+    command_logger = None
+
+    def format_output(self, command, output):
+        title = f"COMMAND '{command['value'].upper()}'"
+        if command["prefix"]:
+            title += f" [{command['prefix']}]"
+        header = f"\n{' ' * 30}{title}\n" f"{' ' * 30}{'*' * len(title)}"
+        command_result = [f"{header}\n\n"] if self.add_header else []
+        for line in output.splitlines():
+            if command["prefix"]:
+                line = f"{command['prefix']} - {line}"
+            command_result.append(line)
+        return "\n".join(command_result)
+
+    def save_configuration(self, device, path, runtime, result):
+        result = "\n\n".join(result)
+        for replacement in self.replacements:
+            result = sub(
+                replacement["pattern"], replacement["replace_with"], result, flags=M
+            )
+        setattr(device, f"last_{self.property}_status", "Success")
+        duration = f"{(datetime.now() - runtime).total_seconds()}s"
+        setattr(device, f"last_{self.property}_duration", duration)
+        if device.update_configuration(self.property, result):
+            with open(path / self.property, "w") as file:
+                file.write(result)
+            setattr(device, f"last_{self.property}_update", str(runtime))
+
+    def format_failure(self, exc):
+        return str(exc)
+
+    def start_backup(self, run, device_id):
+        device = db.fetch("device", id=device_id, rbac=None)
+        local_path = run.sub(run.local_path, locals())
+        path = Path.cwd() / local_path / device.name
+        path.mkdir(parents=True, exist_ok=True)
+        runtime = datetime.now()
+        setattr(device, f"last_{self.property}_runtime", str(runtime))
+        return path, runtime, run.sub(self.commands, locals())
+
+    def end_backup(self, run, device_id, path, runtime, result, failure):
+        device = db.fetch("device", id=device_id, rbac=None)
+        if not failure:
+            try:
+                self.save_configuration(device, path, runtime, result)
+            except Exception as exc:
+                failure = self.format_failure(exc)
+        if failure:
+            setattr(device, f"last_{self.property}_status", "Failure")
+            setattr(device, f"last_{self.property}_failure", str(runtime))
+            return {"success": False, "result": failure}
+        run.update_configuration_properties(path, self.property, device)
+        return {"success": True}
+
+    async def async_job(self, run, device):
+        device_id, result, failure = device.id, [], None
+        path, runtime, commands = await run.run_sync(self.start_backup, run, device_id)
+        try:
+            for command in commands:
+                if not command["value"]:
+                    continue
+                run.log(
+                    "info",
+                    f"Running command '{command['value']}'",
+                    device,
+                    logger=self.command_logger,
+                )
+                output = await self.async_send_command(run, device, command["value"])
+                result.append(self.format_output(command, output))
+        except Exception as exc:
+            failure = self.format_failure(exc)
+        return await run.run_sync(
+            self.end_backup, run, device_id, path, runtime, result, failure
+        )
+
+
 class Result(AbstractBase):
     __tablename__ = type = "result"
     private = True
@@ -309,6 +394,24 @@ class ServiceLog(AbstractBase):
         return f"SERVICE '{self.service}' ({self.runtime})"
 
 
+class RunTiming(AbstractBase):
+    __tablename__ = type = "run_timing"
+    private = True
+    log_change = False
+    id = db.Column(Integer, primary_key=True)
+    run_id = db.Column(Integer, ForeignKey("run.id", ondelete="cascade"), index=True)
+    run = relationship("Run", back_populates="timings")
+    service_id = db.Column(Integer)
+    device = db.Column(db.SmallString)
+    stack = db.Column(db.SmallString)
+    count = db.Column(Integer, default=0)
+    duration = db.Column(Float, default=0.0)
+    maximum = db.Column(Float, default=0.0)
+
+    def __repr__(self):
+        return f"{self.run_id}: {self.stack} ({self.device or 'no device'})"
+
+
 class ServiceReport(AbstractBase):
     __tablename__ = type = "service_report"
     private = True
@@ -344,6 +447,7 @@ class Run(AbstractBase):
     trigger = db.Column(db.TinyString)
     path = db.Column(db.TinyString)
     parameterized_run = db.Column(Boolean, default=False)
+    profiling = db.Column(Boolean, default=False)
     server_id = db.Column(Integer, ForeignKey("server.id"))
     server = relationship("Server", back_populates="runs")
     server_name = association_proxy("server", "name")
@@ -372,6 +476,9 @@ class Run(AbstractBase):
     worker = relationship("Worker", back_populates="runs")
     state = db.Column(db.Dict, info={"log_change": False})
     results = relationship("Result", back_populates="run", cascade="all, delete-orphan")
+    timings = relationship(
+        "RunTiming", back_populates="run", cascade="all, delete-orphan"
+    )
     model_properties = {
         "progress": "str",
         "server_properties": "dict",
@@ -411,10 +518,12 @@ class Run(AbstractBase):
         if self.state:
             return self.state
         elif env.redis_queue:
-            keys = env.redis("keys", f"{self.runtime}/state/*")
+            if self.runtime in vs.run_instances:
+                env.flush_redis()
+            keys = env.redis_scan(f"{self.runtime}/state/*")
             if not keys:
                 return {}
-            data, state = list(zip(keys, env.redis("mget", *keys))), {}
+            data, state = list(zip(keys, env.redis_mget(keys))), {}
             for log, value in data:
                 inner_store, (*path, last_key) = state, log.split("/")[2:]
                 for key in path:
@@ -440,46 +549,53 @@ class Run(AbstractBase):
             return "N/A"
 
     def run(self):
-        worker = db.factory(
-            "worker",
-            name=str(getpid()),
-            subtype=environ.get("_", "").split("/")[-1],
-            server_id=vs.server_id,
-        )
-        server = db.fetch("server", id=vs.server_id)
-        worker.current_runs = 1 if not worker.current_runs else worker.current_runs + 1
-        server.current_runs += 1
-        self.worker = worker
-        vs.run_targets[self.runtime] = set(
-            device.id
-            for device in controller.filtering(
-                "device", properties=["id"], rbac="target", username=self.creator
+        with db.rbac_scope():
+            worker = db.factory(
+                "worker",
+                name=str(getpid()),
+                subtype=environ.get("_", "").split("/")[-1],
+                server_id=vs.server_id,
+            )
+            server = db.fetch("server", id=vs.server_id)
+            worker.current_runs = (
+                1 if not worker.current_runs else worker.current_runs + 1
+            )
+            server.current_runs += 1
+            self.worker = worker
+            vs.run_targets[self.runtime] = set(
+                device.id
+                for device in controller.filtering(
+                    "device", properties=["id"], rbac="target", username=self.creator
+                )
+            )
+            if not self.trigger:
+                run_type = "Parameterized" if self.parameterized_run else "Regular"
+                self.trigger = f"{run_type} Run"
+            self.service_run = Runner(
+                self,
+                payload=deepcopy(self.payload),
+                service=self.service,
+                is_main_run=True,
+                restart_run=self.restart_run,
+                parameterized_run=self.parameterized_run,
+                parent_runtime=self.runtime,
+                path=self.path,
+                placeholder=self.placeholder,
+                properties=self.properties,
+                start_services=self.start_services,
+                task=self.task,
+                trigger=self.trigger,
             )
-        )
-        if not self.trigger:
-            run_type = "Parameterized" if self.parameterized_run else "Regular"
-            self.trigger = f"{run_type} Run"
-        self.service_run = Runner(
-            self,
-            payload=deepcopy(self.payload),
-            service=self.service,
-            is_main_run=True,
-            restart_run=self.restart_run,
-            parameterized_run=self.parameterized_run,
-            parent_runtime=self.runtime,
-            path=self.path,
-            placeholder=self.placeholder,
-            properties=self.properties,
-            start_services=self.start_services,
-            task=self.task,
-            trigger=self.trigger,
-        )
         self.payload = self.service_run.payload
         worker.current_runs -= 1
         server.current_runs -= 1
         db.session.commit()
+        vs.models["pool"].apply_pool_updates()
         vs.run_targets.pop(self.runtime)
         vs.run_services.pop(self.runtime)
+        vs.run_results.pop(self.runtime, None)
+        vs.run_device_cache.pop(self.runtime, None)
+        vs.run_timings.pop(self.runtime, None)
         return self.service_run.results
 
 
@@ -1,6 +1,6 @@
 from collections import defaultdict
 from flask_login import current_user
-from sqlalchemy import or_
+from sqlalchemy import and_, or_
 from sqlalchemy.ext.mutable import MutableDict, MutableList
 from sqlalchemy.sql.expression import false
 
@@ -114,12 +114,21 @@ class AbstractBase(db.base):
             return query
         if join_class:
             query = query.join(getattr(cls, join_class))
-        user_group = [group.id for group in user.groups]
-        property = getattr(vs.models[model], f"rbac_{mode}")
-        rbac_constraint = property.any(vs.models["group"].id.in_(user_group))
-        owners_constraint = vs.models[model].owners.any(id=user.id)
         if hasattr(vs.models[model], "admin_only"):
             query = query.filter(vs.models[model].admin_only == false())
+        if db.materialized_rbac:
+            table = getattr(db, f"{model}_access_table")
+            return query.join(
+                table,
+                and_(
+                    table.c[f"{model}_id"] == vs.models[model].id,
+                    table.c.user_id == user["id"],
+                    table.c.access == f"rbac_{mode}",
+                ),
+            )
+        property = getattr(vs.models[model], f"rbac_{mode}")
+        rbac_constraint = property.any(vs.models["group"].id.in_(user["groups"]))
+        owners_constraint = vs.models[model].owners.any(id=user["id"])
         return query.filter(or_(owners_constraint, rbac_constraint))
 
     def update_rbac(self):
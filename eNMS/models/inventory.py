@@ -1,12 +1,22 @@
-from re import search, sub
-from sqlalchemy import and_, Boolean, event, ForeignKey, Integer, or_
+from collections import defaultdict
+from concurrent.futures import as_completed, ProcessPoolExecutor
+from datetime import datetime
+from logging import info
+from multiprocessing import get_context
+from os import getpid
+from re import compile, escape, I, MULTILINE
+from sqlalchemy import and_, Boolean, case, event, ForeignKey, inspect, Integer, or_
+from sqlalchemy import func, select, tuple_, update
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy.orm import backref, deferred, relationship
+from sqlalchemy.orm import backref, deferred, object_session, relationship
 from sqlalchemy.schema import UniqueConstraint
+from threading import Lock
+from traceback import format_exc
 
 from eNMS.controller import controller
 from eNMS.models.base import AbstractBase
 from eNMS.database import db
+from eNMS.environment import env
 from eNMS.variables import vs
 
 
@@ -106,8 +116,21 @@ class Device(Node):
             for timestamp in vs.timestamps:
                 column = db.Column(db.SmallString, default="Never")
                 setattr(cls, f"last_{property}_{timestamp}", column)
+            digest_column = db.Column(db.TinyString, info={"log_change": False})
+            setattr(cls, f"{property}_digest", digest_column)
+            db.dont_migrate["device"].append(f"{property}_digest")
         return cls
 
+    def update_configuration(self, property, value):
+        digest = getattr(self, f"{property}_digest")
+        if not digest:
+            digest = db.get_digest(getattr(self, property) or "")
+            setattr(self, f"{property}_digest", digest)
+        if digest == db.get_digest(value):
+            return False
+        setattr(self, property, value)
+        return True
+
     def get_neighbors(self, object_type, direction="both", **link_constraints):
         filters = [
             vs.models["link"].destination == self,
@@ -151,44 +174,16 @@ class Device(Node):
             regex_match = kwargs["form"].get(f"{property}_filter") == "regex"
             if not data:
                 properties[property] = ""
+                continue
+            result = self.get_search_matches(
+                getattr(self, property), data, regex_match, context, rest_api_request
+            )
+            if rest_api_request:
+                properties[f"{property}_matches"] = result
             else:
-                result = []
-                content, visited = getattr(self, property).splitlines(), set()
-                for index, line in enumerate(content):
-                    match_lines, merge = [], index - context - 1 in visited
-                    if (
-                        not search(data, line)
-                        if regex_match
-                        else data.lower() not in line.lower()
-                    ):
-                        continue
-                    for i in range(-context, context + 1):
-                        if index + i < 0 or index + i > len(content) - 1:
-                            continue
-                        if index + i in visited:
-                            merge = True
-                            continue
-                        visited.add(index + i)
-                        line = content[index + i].strip()
-                        if rest_api_request:
-                            match_lines.append(f"L{index + i + 1}: {line}")
-                            continue
-                        line = sub(f"(?i){data}", r"<mark>\g<0></mark>", line)
-                        match_lines.append(f"<b>L{index + i + 1}:</b> {line}")
-                    if rest_api_request:
-                        result.extend(match_lines)
-                    else:
-                        if merge:
-                            result[-1] += f"<br>{'<br>'.join(match_lines)}"
-                        else:
-                            result.append("<br>".join(match_lines))
-                if rest_api_request:
-                    properties[f"{property}_matches"] = result
-                else:
-                    properties[property] = "".join(
-                        f"<pre style='text-align: left'>{match}</pre>"
-                        for match in result
-                    )
+                properties[property] = "".join(
+                    f"<pre style='text-align: left'>{match}</pre>" for match in result
+                )
         return properties
 
     @property
@@ -210,6 +205,52 @@ class Device(Node):
     def __repr__(self):
         return f"{self.name} ({self.model})" if self.model else str(self.name)
 
+    @staticmethod
+    def get_matching_lines(content, data, regex_match):
+        pattern = compile(data, MULTILINE) if regex_match else compile(escape(data), I)
+        text, lowercase_data = "\n".join(content), data.lower()
+        index, position, indexes = 0, 0, []
+        while content:
+            match = pattern.search(text, position)
+            if not match:
+                return indexes
+            index += text.count("\n", position, match.start())
+            line = content[index]
+            if pattern.search(line) if regex_match else lowercase_data in line.lower():
+                indexes.append(index)
+            position = text.find("\n", match.start()) + 1
+            if not position:
+                break
+            index += 1
+        return indexes
+
+    @classmethod
+    def get_search_matches(cls, value, data, regex_match, context, raw=False):
+        result, content, visited = [], (value or "").splitlines(), set()
+        highlight = compile(data if regex_match else escape(data), I)
+        for index in cls.get_matching_lines(content, data, regex_match):
+            match_lines, merge = [], index - context - 1 in visited
+            for i in range(-context, context + 1):
+                if index + i < 0 or index + i > len(content) - 1:
+                    continue
+                if index + i in visited:
+                    merge = True
+                    continue
+                visited.add(index + i)
+                line = content[index + i].strip()
+                if raw:
+                    match_lines.append(f"L{index + i + 1}: {line}")
+                    continue
+                line = highlight.sub(r"<mark>\g<0></mark>", line)
+                match_lines.append(f"<b>L{index + i + 1}:</b> {line}")
+            if raw:
+                result.extend(match_lines)
+            elif merge:
+                result[-1] += f"<br>{'<br>'.join(match_lines)}"
+            else:
+                result.append("<br>".join(match_lines))
+        return result
+
 
 class Link(Object):
     __tablename__ = class_type = export_type = "link"
@@ -273,6 +314,7 @@ class Link(Object):
 class Pool(AbstractBase):
     __tablename__ = type = class_type = "pool"
     models = ("device", "link")
+    pool_updates, pool_updates_lock = defaultdict(set), Lock()
     id = db.Column(Integer, primary_key=True)
     name = db.Column(db.SmallString, unique=True)
     manually_defined = db.Column(Boolean, default=False)
@@ -308,6 +350,62 @@ class Pool(AbstractBase):
                 number = getattr(target, f"{value.class_type}_number")
                 setattr(target, f"{value.class_type}_number", number - 1)
 
+            @event.listens_for(vs.models[model], "after_insert", propagate=True)
+            def queue_insertion(mapper, connection, target):
+                cls.queue_pool_update(target)
+
+            @event.listens_for(vs.models[model], "after_update", propagate=True)
+            def queue_update(mapper, connection, target):
+                state = inspect(target)
+                properties = vs.properties["filtering"][target.class_type]
+                if target.class_type == "link":
+                    properties = properties + ["source_id", "destination_id"]
+                if any(
+                    state.attrs[property].history.has_changes()
+                    for property in properties
+                    if property in state.attrs
+                ):
+                    cls.queue_pool_update(target)
+
+        @event.listens_for(db.session, "after_commit")
+        def collect_pool_updates(session):
+            pool_updates = session.info.pop("pool_updates", None)
+            if not pool_updates:
+                return
+            with cls.pool_updates_lock:
+                for model, object_ids in pool_updates.items():
+                    cls.pool_updates[model] |= object_ids
+
+        @event.listens_for(db.session, "after_rollback")
+        def discard_pool_updates(session):
+            session.info.pop("pool_updates", None)
+
+    @staticmethod
+    def queue_pool_update(instance):
+        if not db.pool_events:
+            return
+        session_info = object_session(instance).info
+        pool_updates = session_info.setdefault("pool_updates", defaultdict(set))
+        pool_updates[instance.class_type].add(instance.id)
+
+    @classmethod
+    def apply_pool_updates(cls):
+        if not cls.pool_updates:
+            return
+        with cls.pool_updates_lock:
+            pool_updates, cls.pool_updates = cls.pool_updates, defaultdict(set)
+        try:
+            with db.session.begin_nested():
+                for model, object_ids in pool_updates.items():
+                    cls.update_object_pools(model, object_ids)
+            db.session.commit()
+        except Exception:
+            env.log(
+                "error",
+                "Incremental pool update failed (use 'Update all pools' to "
+                f"recompute the pools):\n{format_exc()}",
+            )
+
     @classmethod
     def database_init(cls):
         for model in cls.models:
@@ -351,38 +449,204 @@ class Pool(AbstractBase):
         if not kwargs.get("migration_import"):
             self.update_last_modified_properties()
 
+    def get_filtering_form(self, model):
+        form = {}
+        for property in vs.properties["filtering"][model]:
+            value = getattr(self, f"{model}_{property}")
+            match_type = getattr(self, f"{model}_{property}_match")
+            invert_type = getattr(self, f"{model}_{property}_invert")
+            if not value and match_type != "empty":
+                continue
+            form.update(
+                {
+                    property: value,
+                    f"{property}_filter": match_type,
+                    f"{property}_invert": invert_type,
+                }
+            )
+        return form
+
+    @classmethod
+    def update_object_pools(cls, model, object_ids, pools=None):
+        table, model_class = getattr(db, f"pool_{model}_table"), vs.models[model]
+        object_column = getattr(table.c, f"{model}_id")
+        object_ids, batch_size = list(object_ids), vs.settings["pools"]["batch_size"]
+        pools = {
+            pool.id: pool
+            for pool in (db.query("pool", rbac=None) if pools is None else pools)
+            if not pool.manually_defined
+        }
+        criteria = []
+        for pool in pools.values():
+            form = pool.get_filtering_form(model)
+            if form:
+                constraints = controller.filtering_base_constraints(model, form=form)
+                criteria.append(
+                    (pool.id, case((and_(*constraints), True), else_=False))
+                )
+        members, current_members = set(), set()
+        for index in range(0, len(object_ids), batch_size):
+            batch_ids = object_ids[index : index + batch_size]
+            for criteria_index in range(0, len(criteria), batch_size):
+                pool_ids, columns = zip(
+                    *criteria[criteria_index : criteria_index + batch_size]
+                )
+                query = db.session.query(model_class.id, *columns).filter(
+                    model_class.id.in_(batch_ids)
+                )
+                for object_id, *matches in query:
+                    members |= {
+                        (pool_id, object_id)
+                        for pool_id, match in zip(pool_ids, matches)
+                        if match
+                    }
+            current_members |= set(
+                db.session.query(table.c.pool_id, object_column).filter(
+                    object_column.in_(batch_ids), table.c.pool_id.in_(list(pools))
+                )
+            )
+        added, removed = members - current_members, current_members - members
+        cls.update_pool_members(model, pools, added, removed)
+
+    @classmethod
+    def update_pool_members(cls, model, pools, added, removed):
+        table = getattr(db, f"pool_{model}_table")
+        object_column = getattr(table.c, f"{model}_id")
+        batch_size, removed = vs.settings["pools"]["batch_size"], list(removed)
+        for index in range(0, len(removed), batch_size):
+            rows = removed[index : index + batch_size]
+            condition = tuple_(table.c.pool_id, object_column).in_(rows)
+            db.session.execute(table.delete().where(condition))
+        if added:
+            db.session.execute(
+                table.insert(),
+                [
+                    {"pool_id": pool_id, f"{model}_id": object_id}
+                    for pool_id, object_id in added
+                ],
+            )
+        changes = defaultdict(lambda: [0, 0])
+        for index, rows in enumerate((added, removed)):
+            for pool_id, _ in rows:
+                changes[pool_id][index] += 1
+        cls.update_pool_numbers(model, [pools[pool_id] for pool_id in changes])
+        if not env.log_events:
+            return
+        for pool_id, (added_number, removed_number) in changes.items():
+            env.log(
+                "info",
+                f"UPDATE: pool '{pools[pool_id].name}': ({model}s: {added_number} "
+                f"added, {removed_number} removed)",
+            )
+
+    @classmethod
+    def update_pool_numbers(cls, model, pools):
+        table, property = getattr(db, f"pool_{model}_table"), f"{model}_number"
+        number = (
+            select(func.count())
+            .where(table.c.pool_id == cls.__table__.c.id)
+            .scalar_subquery()
+        )
+        pool_ids = [pool.id for pool in pools]
+        batch_size = vs.settings["pools"]["batch_size"]
+        for index in range(0, len(pool_ids), batch_size):
+            db.session.execute(
+                update(cls.__table__)
+                .where(cls.__table__.c.id.in_(pool_ids[index : index + batch_size]))
+                .values({property: number})
+            )
+        for pool in pools:
+            db.session.expire(pool, [property])
+
+    def get_members(self, model):
+        form = self.get_filtering_form(model)
+        if not form:
+            return set()
+        kwargs = {"bulk": "object", "rbac": None, "properties": ["id"], "form": form}
+        return {instance.id for instance in controller.filtering(model, **kwargs)}
+
+    def set_members(self, model, object_ids):
+        table = getattr(db, f"pool_{model}_table")
+        object_column = getattr(table.c, f"{model}_id")
+        members = {(self.id, object_id) for object_id in object_ids}
+        current_members = set(
+            db.session.query(table.c.pool_id, object_column).filter(
+                table.c.pool_id == self.id
+            )
+        )
+        self.update_pool_members(
+            model,
+            {self.id: self},
+            members - current_members,
+            current_members - members,
+        )
+        if members == current_members:
+            self.update_pool_numbers(model, [self])
+
     def compute_pool(self):
         for model in self.models:
-            if not self.manually_defined:
-                kwargs = {"bulk": "object", "rbac": None, "form": {}}
-                for property in vs.properties["filtering"][model]:
-                    value = getattr(self, f"{model}_{property}")
-                    match_type = getattr(self, f"{model}_{property}_match")
-                    invert_type = getattr(self, f"{model}_{property}_invert")
-                    if not value and match_type != "empty":
-                        continue
-                    kwargs["form"].update(
-                        {
-                            property: value,
-                            f"{property}_filter": match_type,
-                            f"{property}_invert": invert_type,
-                        }
-                    )
-                if kwargs["form"]:
-                    instances = controller.filtering(model, properties=["id"], **kwargs)
-                else:
-                    instances = []
-                table = getattr(db, f"pool_{model}_table")
-                db.session.execute(table.delete().where(table.c.pool_id == self.id))
-                if instances:
-                    values = [
-                        {"pool_id": self.id, f"{model}_id": instance.id}
-                        for instance in instances
-                    ]
-                    db.session.execute(table.insert().values(values))
+            if self.manually_defined:
+                setattr(self, f"{model}_number", len(getattr(self, f"{model}s")))
             else:
-                instances = getattr(self, f"{model}s")
-            setattr(self, f"{model}_number", len(instances))
+                self.set_members(model, self.get_members(model))
+
+    @staticmethod
+    def get_pool_members(pool_id):
+        try:
+            pool = db.fetch("pool", id=pool_id, rbac=None)
+            return {model: pool.get_members(model) for model in pool.models}
+        finally:
+            db.session.rollback()
+
+    @staticmethod
+    def initialize_process():
+        # eNMS is imported while the process is spawned to load it without the
+        # application startup tasks (see env.detect_spawned_process)
+        info(f"Pool process {getpid()} started")
+
+    @classmethod
+    def compute_pools(cls, pools):
+        pools, processes = list(pools), vs.settings["pools"]["processes"]
+        threshold = max(vs.settings["pools"]["process_threshold"], 2)
+        if processes < 2 or len(pools) < threshold:
+            for pool in pools:
+                pool.compute_pool()
+            return
+        pools = {pool.id: pool for pool in pools}
+        for pool in pools.values():
+            if pool.manually_defined:
+                pool.compute_pool()
+        pool_ids = [pool.id for pool in pools.values() if not pool.manually_defined]
+        if not pool_ids:
+            return
+        env.log("info", f"Computing {len(pool_ids)} pools with {processes} processes")
+        step, start_time = max(len(pool_ids) // 10, 1), datetime.now()
+        with ProcessPoolExecutor(
+            max_workers=min(processes, len(pool_ids)),
+            mp_context=get_context("spawn"),
+            initializer=cls.initialize_process,
+        ) as executor:
+            futures = {
+                executor.submit(cls.get_pool_members, pool_id): pool_id
+                for pool_id in pool_ids
+            }
+            for index, future in enumerate(as_completed(futures), 1):
+                pool = pools[futures[future]]
+                try:
+                    for model, object_ids in future.result().items():
+                        pool.set_members(model, object_ids)
+                except Exception:
+                    env.log(
+                        "error", f"Pool '{pool.name}' update failed:\n{format_exc()}"
+                    )
+                    pool.compute_pool()
+                if not index % step or index == len(pool_ids):
+                    env.log(
+                        "info",
+                        f"Pool update: {index}/{len(pool_ids)} pools computed"
+                        f" ({datetime.now() - start_time})",
+                        change_log=False,
+                    )
 
 
 class Session(AbstractBase):
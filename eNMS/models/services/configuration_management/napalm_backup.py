@@ -3,7 +3,6 @@ from flask_wtf import FlaskForm
 from pathlib import Path
 from re import M, sub
 from sqlalchemy import ForeignKey, Integer
-from sqlalchemy.orm import load_only
 from wtforms import FormField
 
 from eNMS.database import db
@@ -58,19 +57,13 @@ class NapalmBackupService(ConnectionService):
                 except Exception as exc:
                     result[getter] = f"{getter} failed because of {exc}"
             result = vs.dict_to_string(result)
-            device_with_deferred_data = (
-                db.query("device")
-                .options(load_only(getattr(vs.models["device"], self.property)))
-                .filter_by(id=device.id)
-                .one()
-            )
-            setattr(device_with_deferred_data, self.property, result)
-            with open(path / self.property, "w") as file:
-                file.write(result)
             setattr(device, f"last_{self.property}_status", "Success")
             duration = f"{(datetime.now() - runtime).total_seconds()}s"
             setattr(device, f"last_{self.property}_duration", duration)
-            setattr(device, f"last_{self.property}_update", str(runtime))
+            if device.update_configuration(self.property, result):
+                with open(path / self.property, "w") as file:
+                    file.write(result)
+                setattr(device, f"last_{self.property}_update", str(runtime))
             run.update_configuration_properties(path, self.property, device)
         except Exception as exc:
             setattr(device, f"last_{self.property}_status", "Failure")
@@ -1,8 +1,6 @@
 from datetime import datetime
 from pathlib import Path
-from re import M, sub
 from sqlalchemy import Boolean, Float, ForeignKey, Integer
-from sqlalchemy.orm import load_only
 from wtforms import FormField
 
 from eNMS.database import db
@@ -14,11 +12,11 @@ from eNMS.fields import (
     SelectField,
     StringField,
 )
-from eNMS.models.automation import ConnectionService
+from eNMS.models.automation import ConfigurationBackupMixin, ConnectionService
 from eNMS.variables import vs
 
 
-class NetmikoBackupService(ConnectionService):
+class NetmikoBackupService(ConfigurationBackupMixin, ConnectionService):
     __tablename__ = "netmiko_backup_service"
     pretty_name = "Netmiko Data Backup"
     parent_type = "connection_service"
@@ -48,6 +46,9 @@ class NetmikoBackupService(ConnectionService):
 
     __mapper_args__ = {"polymorphic_identity": "netmiko_backup_service"}
 
+    def supports_asyncio(self, run):
+        return not (run.enable_mode or run.config_mode or run.jump_on_connect)
+
     def job(self, run, device):
         local_path = run.sub(run.local_path, locals())
         path = Path.cwd() / local_path / device.name
@@ -62,38 +63,11 @@ class NetmikoBackupService(ConnectionService):
                 if not command["value"]:
                     continue
                 run.log("info", f"Running command '{command['value']}'", device)
-                title = f"COMMAND '{command['value'].upper()}'"
-                if command["prefix"]:
-                    title += f" [{command['prefix']}]"
-                header = f"\n{' ' * 30}{title}\n" f"{' ' * 30}{'*' * len(title)}"
-                command_result = [f"{header}\n\n"] if self.add_header else []
-                for line in netmiko_connection.send_command(
-                    command["value"],
-                    read_timeout=run.read_timeout,
-                ).splitlines():
-                    if command["prefix"]:
-                        line = f"{command['prefix']} - {line}"
-                    command_result.append(line)
-                result.append("\n".join(command_result))
-            result = "\n\n".join(result)
-            for replacement in self.replacements:
-                result = sub(
-                    replacement["pattern"], replacement["replace_with"], result, flags=M
+                output = netmiko_connection.send_command(
+                    command["value"], read_timeout=run.read_timeout
                 )
-            device_with_deferred_data = (
-                db.query("device")
-                .options(load_only(getattr(vs.models["device"], self.property)))
-                .filter_by(id=device.id)
-                .one()
-            )
-            setattr(device, f"last_{self.property}_status", "Success")
-            duration = f"{(datetime.now() - runtime).total_seconds()}s"
-            setattr(device, f"last_{self.property}_duration", duration)
-            if getattr(device_with_deferred_data, self.property) != result:
-                setattr(device_with_deferred_data, self.property, result)
-                with open(path / self.property, "w") as file:
-                    file.write(result)
-                setattr(device, f"last_{self.property}_update", str(runtime))
+                result.append(self.format_output(command, output))
+            self.save_configuration(device, path, runtime, result)
         except Exception as exc:
             setattr(device, f"last_{self.property}_status", "Failure")
             setattr(device, f"last_{self.property}_failure", str(runtime))
@@ -101,6 +75,11 @@ class NetmikoBackupService(ConnectionService):
         run.update_configuration_properties(path, self.property, device)
         return {"success": True}
 
+    async def async_send_command(self, run, device, command):
+        connection = await run.asyncssh_connection(device)
+        response = await connection.run(command, check=True, timeout=run.read_timeout)
+        return response.stdout
+
 
 class NetmikoBackupForm(NetmikoForm):
     form_type = HiddenField(default="netmiko_backup_service")
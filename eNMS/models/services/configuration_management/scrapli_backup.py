@@ -1,22 +1,21 @@
 from datetime import datetime
 from pathlib import Path
-from re import M, sub
 from sqlalchemy import Boolean, Float, ForeignKey, Integer
-from sqlalchemy.orm import load_only
 from wtforms import FormField
 
 from eNMS.database import db
 from eNMS.forms import ScrapliForm, CommandsForm, ReplacementForm
 from eNMS.fields import BooleanField, FieldList, HiddenField, SelectField, StringField
-from eNMS.models.automation import ConnectionService
+from eNMS.models.automation import ConfigurationBackupMixin, ConnectionService
 from eNMS.variables import vs
 from traceback import format_exc
 
 
-class ScrapliBackupService(ConnectionService):
+class ScrapliBackupService(ConfigurationBackupMixin, ConnectionService):
     __tablename__ = "scrapli_backup_service"
     pretty_name = "Scrapli Data Backup"
     parent_type = "connection_service"
+    command_logger = "security"
     id = db.Column(Integer, ForeignKey("connection_service.id"), primary_key=True)
 
     is_configuration = db.Column(Boolean, default=False)
@@ -33,6 +32,9 @@ class ScrapliBackupService(ConnectionService):
 
     __mapper_args__ = {"polymorphic_identity": "scrapli_backup_service"}
 
+    def format_failure(self, exc):
+        return format_exc()
+
     def job(self, run, device):
         local_path = run.sub(run.local_path, locals())
         path = Path.cwd() / local_path / device.name
@@ -52,37 +54,9 @@ class ScrapliBackupService(ConnectionService):
                     device,
                     logger="security",
                 )
-                title = f"COMMAND '{command['value'].upper()}'"
-                if command["prefix"]:
-                    title += f" [{command['prefix']}]"
-                header = f"\n{' ' * 30}{title}\n" f"{' ' * 30}{'*' * len(title)}"
-                command_result = [f"{header}\n\n"] if self.add_header else []
-                for line in scrapli_connection.send_command(
-                    command["value"]
-                ).result.splitlines():
-                    if command["prefix"]:
-                        line = f"{command['prefix']} - {line}"
-                    command_result.append(line)
-                result.append("\n".join(command_result))
-            result = "\n\n".join(result)
-            for replacement in self.replacements:
-                result = sub(
-                    replacement["pattern"], replacement["replace_with"], result, flags=M
-                )
-            device_with_deferred_data = (
-                db.query("device")
-                .options(load_only(getattr(vs.models["device"], self.property)))
-                .filter_by(id=device.id)
-                .one()
-            )
-            setattr(device, f"last_{self.property}_status", "Success")
-            duration = f"{(datetime.now() - runtime).total_seconds()}s"
-            setattr(device, f"last_{self.property}_duration", duration)
-            if getattr(device_with_deferred_data, self.property) != result:
-                setattr(device_with_deferred_data, self.property, result)
-                with open(path / self.property, "w") as file:
-                    file.write(result)
-                setattr(device, f"last_{self.property}_update", str(runtime))
+                output = scrapli_connection.send_command(command["value"]).result
+                result.append(self.format_output(command, output))
+            self.save_configuration(device, path, runtime, result)
         except Exception:
             setattr(device, f"last_{self.property}_status", "Failure")
             setattr(device, f"last_{self.property}_failure", str(runtime))
@@ -90,6 +64,10 @@ class ScrapliBackupService(ConnectionService):
         run.update_configuration_properties(path, self.property, device)
         return {"success": True}
 
+    async def async_send_command(self, run, device, command):
+        connection = await run.async_scrapli_connection(device)
+        return (await connection.send_command(command)).result
+
 
 class ScrapliBackupForm(ScrapliForm):
     form_type = HiddenField(default="scrapli_backup_service")
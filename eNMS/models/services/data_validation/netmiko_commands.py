@@ -44,13 +44,41 @@ class NetmikoValidationService(ConnectionService):
 
     __mapper_args__ = {"polymorphic_identity": "netmiko_commands_service"}
 
-    def job(self, run, device):
+    def get_commands(self, run, device):
         local_variables = locals()
         if self.jinja2_template:
             variables = {**local_variables, **run.global_variables()}
-            commands = Template(run.commands).render(variables)
+            return Template(run.commands).render(variables)
         else:
-            commands = run.sub(run.commands, local_variables)
+            return run.sub(run.commands, local_variables)
+
+    def format_result(self, run, commands, result):
+        if len(result) == 1:
+            (result,) = result
+        elif not run.results_as_list:
+            for index in range(len(result)):
+                prefix = "{}COMMAND :".format("\n" if index else "")
+                result[index] = prefix + commands[index] + "\n\n" + result[index]
+            result = "\n".join(map(str, result))
+        return result
+
+    def supports_asyncio(self, run):
+        disabled_options = (
+            "enable_mode",
+            "config_mode",
+            "jump_on_connect",
+            "use_textfsm",
+            "use_genie",
+            "expect_string",
+        )
+        enabled_options = ("auto_find_prompt", "strip_prompt", "strip_command")
+        return not any(getattr(run, property) for property in disabled_options) and all(
+            getattr(run, property) for property in enabled_options
+        )
+
+    def job(self, run, device):
+        local_variables = locals()
+        commands = self.get_commands(run, device)
         netmiko_connection = run.netmiko_connection(device)
         try:
             prompt = run.enter_remote_device(netmiko_connection, device)
@@ -75,13 +103,7 @@ class NetmikoValidationService(ConnectionService):
                 )
                 for command in commands
             ]
-            if len(result) == 1:
-                (result,) = result
-            elif not run.results_as_list:
-                for index in range(len(result)):
-                    prefix = "{}COMMAND :".format("\n" if index else "")
-                    result[index] = prefix + commands[index] + "\n\n" + result[index]
-                result = "\n".join(map(str, result))
+            result = self.format_result(run, commands, result)
             run.exit_remote_device(netmiko_connection, prompt, device)
         except Exception:
             result = (
@@ -97,6 +119,29 @@ class NetmikoValidationService(ConnectionService):
             }
         return {"commands": commands, "result": result}
 
+    async def async_job(self, run, device):
+        commands = await run.run_sync(self.get_commands, run, device)
+        connection = await run.asyncssh_connection(device)
+        run.log(
+            "info",
+            f"sending COMMAND '{commands}' with Asyncssh",
+            device,
+            logger="security",
+        )
+        commands, result = commands.splitlines(), []
+        for command in commands:
+            response = await connection.run(command, timeout=run.read_timeout)
+            if response.exit_status:
+                return {
+                    "commands": commands,
+                    "error": response.stderr,
+                    "result": "\n".join(result + [response.stdout]),
+                    "success": False,
+                }
+            result.append(response.stdout)
+        result = self.format_result(run, commands, result)
+        return {"commands": commands, "result": result}
+
 
 class NetmikoValidationForm(NetmikoForm):
     form_type = HiddenField(default="netmiko_commands_service")
@@ -25,21 +25,22 @@ class ScrapliService(ConnectionService):
 
     __mapper_args__ = {"polymorphic_identity": "scrapli_service"}
 
-    def job(self, run, device):
+    def get_commands(self, run, device):
         if self.jinja2_template:
             variables = {**locals(), **run.global_variables()}
             commands = Template(run.commands).render(variables)
         else:
             commands = run.sub(run.commands, locals())
         commands = commands.splitlines()
-        function = "send_configs" if run.is_configuration else "send_commands"
         run.log(
             "info",
             f"sending COMMANDS {commands} with Scrapli",
             device,
             logger="security",
         )
-        multi_response = getattr(run.scrapli_connection(device), function)(commands)
+        return commands, "send_configs" if run.is_configuration else "send_commands"
+
+    def format_result(self, commands, multi_response):
         if self.results_as_list:
             result = [response.result for response in multi_response]
         elif len(commands) == 1:
@@ -51,6 +52,17 @@ class ScrapliService(ConnectionService):
             )
         return {"commands": commands, "result": result}
 
+    def job(self, run, device):
+        commands, function = self.get_commands(run, device)
+        multi_response = getattr(run.scrapli_connection(device), function)(commands)
+        return self.format_result(commands, multi_response)
+
+    async def async_job(self, run, device):
+        commands, function = await run.run_sync(self.get_commands, run, device)
+        connection = await run.async_scrapli_connection(device)
+        multi_response = await getattr(connection, function)(commands)
+        return self.format_result(commands, multi_response)
+
 
 class ScrapliCommandsForm(ScrapliForm):
     form_type = HiddenField(default="scrapli_service")
@@ -182,11 +182,16 @@ class Workflow(Service):
                     "workflow_run_method": run.run_method,
                 }
                 if tracking_bfs or device:
-                    kwargs["target_devices"] = []
-                    for name in targets[service.name]:
-                        if name not in device_store:
-                            device_store[name] = db.fetch("device", name=name)
-                        kwargs["target_devices"].append(device_store[name])
+                    names = targets[service.name]
+                    device_store.update(
+                        run.load_devices(
+                            [name for name in names if name not in device_store],
+                            "name",
+                        )
+                    )
+                    kwargs["target_devices"] = [
+                        device_store[name] for name in names if name in device_store
+                    ]
                 if run.parent_device:
                     kwargs["parent_device"] = run.parent_device
                 results = Runner(run, payload=run.payload, **kwargs).results
@@ -1,4 +1,6 @@
 from collections import defaultdict
+from dramatiq import get_broker
+from flask import Response
 from flask_login import current_user
 from threading import Thread
 from traceback import format_exc
@@ -16,6 +18,7 @@ class RestApi:
             "configuration": "get_configuration",
             "instance": "get_instance",
             "is_alive": "is_alive",
+            "metrics": "get_metrics",
             "query": "query",
             "result": "get_result",
             "workers": "get_workers",
@@ -36,6 +39,7 @@ class RestApi:
     allowed_endpoints = [
         "get_cluster_status",
         "get_git_content",
+        "search_configurations",
         "update_all_pools",
         "update_database_configurations_from_git",
         "update_device_rbac",
@@ -72,6 +76,36 @@ class RestApi:
                 "result": result.result if result else "No results yet.",
             }
 
+    def get_metrics(self, **_):
+        gauges = {
+            ("enms_active_runs", ()): db.query("run", rbac=None)
+            .filter_by(status="Running")
+            .count(),
+            ("enms_runner_instances", ()): len(vs.run_instances),
+            ("enms_connection_pool_size", ()): len(vs.connection_pool),
+        }
+        for service_id, count in list(vs.service_run_count.items()):
+            if count:
+                gauges[("enms_service_run_count", (("service", service_id),))] = count
+        counters = {}
+        with vs.connection_pool_lock:
+            connection_pool_metrics = list(vs.connection_pool_metrics.items())
+        for key, count in connection_pool_metrics:
+            library, event = key.split("_", 1)
+            labels = (("event", event), ("library", library))
+            counters[("enms_connection_pool_events_total", labels)] = count
+        if vs.settings["automation"]["use_task_queue"]:
+            broker = get_broker()
+            queues = sorted(broker.get_declared_queues())
+            pipeline = broker.client.pipeline(transaction=False)
+            for queue in queues:
+                pipeline.llen(f"{broker.namespace}:{queue}")
+            env.increment("enms_redis_round_trips_total", operation="pipeline")
+            for queue, queue_depth in zip(queues, pipeline.execute()):
+                gauges[("enms_task_queue_depth", (("queue", queue),))] = queue_depth
+        metrics = env.get_metrics(gauges, counters)
+        return Response(metrics, mimetype="text/plain; version=0.0.4")
+
     def get_workers(self):
         return env.get_workers()
 
@@ -1,11 +1,18 @@
+from asyncio import gather, get_running_loop, run as asyncio_run, Semaphore
+from asyncio import sleep as asyncio_sleep
 from builtins import __dict__ as builtins
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
 from copy import deepcopy
 from datetime import datetime
-from functools import partial
+from functools import lru_cache, partial, wraps
 from importlib import __import__ as importlib_import
+from inspect import iscoroutinefunction
 from io import BytesIO, StringIO
 from jinja2 import Template
-from json import dump, load, loads
+from json import dump, dumps, load, loads
 from json.decoder import JSONDecodeError
 from multiprocessing.pool import ThreadPool
 from napalm import get_network_driver
@@ -19,7 +26,7 @@ from requests import post
 from scp import SCPClient
 from sys import getsizeof
 from threading import Thread
-from time import sleep
+from time import perf_counter, sleep, time
 from traceback import format_exc
 from types import GeneratorType
 from warnings import warn
@@ -27,11 +34,16 @@ from xmltodict import parse
 from xml.parsers.expat import ExpatError
 
 try:
-    from scrapli import Scrapli
+    from scrapli import AsyncScrapli, Scrapli
     from scrapli_netconf.driver import NetconfDriver
 except ImportError as exc:
     warn(f"Couldn't import scrapli module ({exc})")
 
+try:
+    from asyncssh import connect as asyncssh_connect, import_private_key
+except ImportError as exc:
+    warn(f"Couldn't import asyncssh module ({exc})")
+
 try:
     from slack_sdk import WebClient
 except ImportError as exc:
@@ -41,6 +53,8 @@ from eNMS.database import db
 from eNMS.environment import env
 from eNMS.variables import vs
 
+profiling_frames = ContextVar("profiling_frames", default=())
+
 
 class Runner:
     def __init__(self, run, **kwargs):
@@ -72,8 +86,15 @@ class Runner:
         self.creator_dict = {"name": creator.name, "email": creator.email}
         if not self.is_main_run:
             self.path = f"{run.path}>{self.service.id}"
+        if self.is_main_run:
+            self.main_run.profiling = bool(self.get("profiling"))
+        self.profiling = self.main_run.profiling
         db.session.commit()
-        self.start_run()
+        profile = self.profile(str(self.service.id))
+        with profile, db.inspect_queries(str(self), "run") as self.query_tracker:
+            self.start_run()
+        if self.is_main_run and self.profiling:
+            self.save_timings()
         vs.run_instances.pop(self.runtime)
 
     def __repr__(self):
@@ -87,6 +108,88 @@ class Runner:
         else:
             raise AttributeError
 
+    def _instrument_connection(library):  # noqa: N805
+        def decorator(func):
+            @wraps(func)
+            def wrapper(self, device):
+                if not self.profiling and not env.metrics_enabled:
+                    return func(self, device)
+                cached = self.get_connection(library, device.name)
+                phase = f"{library}_connection_{'reuse' if cached else 'open'}"
+                with self.profile(phase, device):
+                    connection = func(self, device)
+                status = (
+                    "hit" if connection is cached else "stale" if cached else "miss"
+                )
+                env.increment(
+                    "enms_connection_cache_total", library=library, status=status
+                )
+                return connection
+
+            return wrapper
+
+        return decorator
+
+    def _profile_device(func):  # noqa: N805
+        if iscoroutinefunction(func):
+
+            @wraps(func)
+            async def wrapper(self, device, **kwargs):
+                with self.profile("device", device):
+                    return await func(self, device, **kwargs)
+
+        else:
+
+            @wraps(func)
+            def wrapper(self, device=None, **kwargs):
+                with self.profile("device", device):
+                    return func(self, device, **kwargs)
+
+        return wrapper
+
+    @contextmanager
+    def profile(self, phase, device=None):
+        if not self.profiling:
+            yield
+            return
+        frames = profiling_frames.get() + (phase,)
+        token, start = profiling_frames.set(frames), perf_counter()
+        try:
+            yield
+        finally:
+            duration = perf_counter() - start
+            profiling_frames.reset(token)
+            key = (self.service.id, getattr(device, "name", ""), ";".join(frames))
+            with vs.run_timings_lock:
+                timings = vs.run_timings[self.parent_runtime]
+                count, total, maximum = timings.get(key, (0, 0.0, 0.0))
+                timings[key] = (count + 1, total + duration, max(maximum, duration))
+
+    def save_timings(self):
+        timings = vs.run_timings.pop(self.parent_runtime, {})
+        rows = [
+            {
+                "run_id": self.main_run.id,
+                "service_id": service_id,
+                "device": device,
+                "stack": stack,
+                "count": count,
+                "duration": duration,
+                "maximum": maximum,
+            }
+            for (service_id, device, stack), (count, duration, maximum) in (
+                timings.items()
+            )
+        ]
+        if not rows:
+            return
+        try:
+            db.session.execute(vs.models["run_timing"].__table__.insert(), rows)
+            db.session.commit()
+        except Exception:
+            self.log("critical", f"Failed to save run timings:\n{format_exc()}")
+            db.session.rollback()
+
     def get(self, property):
         if self.parameterized_run and property in self.payload["form"]:
             return self.payload["form"][property]
@@ -130,6 +233,19 @@ class Runner:
         else:
             return vs.run_stop[self.parent_runtime]
 
+    @property
+    def use_asyncio(self):
+        if self.get("multiprocessing_method") != "asyncio":
+            return False
+        elif not self.service.supports_asyncio(self):
+            log = (
+                f"'{self.service.type}' has no asyncio support with these "
+                "parameters: using threads"
+            )
+            self.log("warning", log)
+            return False
+        return True
+
     @property
     def progress(self):
         progress = self.main_run.get_state().get(self.path, {}).get("progress")
@@ -141,16 +257,64 @@ class Runner:
         except (KeyError, TypeError):
             return "N/A"
 
+    def cache_devices(self, devices):
+        cache = vs.run_device_cache[self.parent_runtime]
+        with vs.run_device_cache_lock:
+            for device in devices:
+                for property in ("id", "name", "ip_address"):
+                    cache[property][getattr(device, property)] = device.id
+
+    def load_devices(self, values, property="id"):
+        if not values:
+            return {}
+        cache = vs.run_device_cache[self.parent_runtime]
+        with vs.run_device_cache_lock:
+            ids = {
+                cache[property][value] for value in values if value in cache[property]
+            }
+            missing_values = set(values) - set(cache[property])
+            cache["hit"] += len(values) - len(missing_values)
+            cache["miss"] += len(missing_values)
+        model, devices = vs.models["device"], []
+        batch_size = vs.settings["automation"]["device_batch_size"]
+        columns = ((model.id, ids), (getattr(model, property), missing_values))
+        for column, values in columns:
+            values = list(values)
+            for index in range(0, len(values), batch_size):
+                query = db.query("device").filter(
+                    column.in_(values[index : index + batch_size])
+                )
+                devices.extend(query.all())
+        self.cache_devices(devices)
+        return {getattr(device, property): device for device in devices}
+
+    def get_device(self, value, property="id"):
+        cache = vs.run_device_cache[self.parent_runtime]
+        with vs.run_device_cache_lock:
+            device_id = cache[property].get(value)
+            cache["hit" if device_id else "miss"] += 1
+        if device_id:
+            return db.session.get(vs.models["device"], device_id)
+        device = db.fetch("device", allow_none=True, **{property: value})
+        if device:
+            self.cache_devices([device])
+        return device
+
     def compute_devices_from_query(_self, query, property, **locals):  # noqa: N805
         values = _self.eval(query, **locals)[0]
         devices, not_found = set(), []
         if isinstance(values, str):
             values = [values]
+        model = vs.models["device"]
+        values = [value for value in values if value is not None]
+        loaded_devices = _self.load_devices(
+            [value for value in values if not isinstance(value, model)], property
+        )
         for value in values:
-            if isinstance(value, vs.models["device"]):
+            if isinstance(value, model):
                 device = value
             else:
-                device = db.fetch("device", allow_none=True, **{property: value})
+                device = loaded_devices.get(value)
             if device:
                 devices.add(device)
             else:
@@ -170,6 +334,7 @@ class Runner:
         if self.is_main_run:
             self.main_run.target_devices = list(devices)
             self.main_run.target_pools = list(pools)
+            self.cache_devices(devices)
         for pool in pools:
             if self.update_target_pools:
                 pool.compute_pool()
@@ -203,7 +368,7 @@ class Runner:
         if env.redis_queue:
             if isinstance(value, bool):
                 value = str(value)
-            env.redis(
+            env.redis_write(
                 {None: "set", "append": "lpush", "increment": "incr"}[method],
                 f"{self.parent_runtime}/state/{self.path}/{path}",
                 value,
@@ -236,15 +401,24 @@ class Runner:
             results.update({"success": False, "result": result})
         finally:
             try:
-                db.session.commit()
+                with self.profile("commit"):
+                    self.flush_results()
+                    db.session.commit()
             except Exception:
                 db.session.rollback()
                 error = "\n".join(format_exc().splitlines())
                 self.log("error", error)
                 results.update({"success": False, "error": error})
+            query_report, query_budget_exceeded = db.query_report(self.query_tracker)
+            if query_report:
+                self.log("warning", query_report)
+            if query_budget_exceeded:
+                results.update({"success": False, "error": query_report})
             if self.update_pools_after_running:
-                for pool in db.fetch_all("pool", username=self.creator, rbac="edit"):
-                    pool.compute_pool()
+                db.session.commit()
+                vs.models["pool"].compute_pools(
+                    db.fetch_all("pool", username=self.creator, rbac="edit")
+                )
             report = self.generate_report(results) if self.service.report else ""
             if self.get("send_notification"):
                 try:
@@ -260,11 +434,16 @@ class Runner:
             results["duration"] = str(now - start)
             self.write_state("result/success", results["success"])
             if self.is_main_run:
+                device_cache = vs.run_device_cache[self.parent_runtime]
+                for key in ("hit", "miss"):
+                    self.write_state(f"device_cache/{key}", device_cache[key])
+                env.flush_redis()
                 state = self.main_run.get_state()
                 status = "Aborted" if self.stop else "Completed"
                 self.main_run.state = state
                 self.main_run.duration = results["duration"]
                 self.main_run.status = state["status"] = status
+                env.increment("enms_runs_total", status=status.lower())
                 self.success = results["success"]
                 self.close_remaining_connections()
             if self.main_run.task and not (
@@ -277,8 +456,10 @@ class Runner:
             if self.is_main_run or len(self.target_devices) > 1 or must_have_results:
                 results = self.create_result(results, run_result=self.is_main_run)
             if env.redis_queue and self.is_main_run:
-                runtime_keys = env.redis("keys", f"{self.parent_runtime}/*") or []
-                env.redis("delete", *runtime_keys)
+                env.flush_redis()
+                runtime_keys = env.redis_scan(f"{self.parent_runtime}/*")
+                if runtime_keys:
+                    env.redis("delete", *runtime_keys)
             vs.custom.run_post_processing(self, results)
 
         self.results = results
@@ -306,10 +487,15 @@ class Runner:
 
     @staticmethod
     def get_device_result(args):
-        device_id, runtime, results = args
-        device = db.fetch("device", id=device_id)
+        device_ids, runtime, results = args
         run = vs.run_instances[runtime]
-        results.append(run.get_results(device))
+        devices = run.load_devices(device_ids)
+        for device_id in device_ids:
+            if device_id not in devices:
+                run.log("error", f"Device with ID {device_id} not found")
+                continue
+            device = devices[device_id]
+            results.append(run.thread_context.copy().run(run.get_results, device))
 
     def device_iteration(self, device):
         derived_devices = self.compute_devices_from_query(
@@ -331,7 +517,8 @@ class Runner:
         ).results["success"]
 
     def device_run(self):
-        self.target_devices = self.compute_devices()
+        with self.profile("targets"):
+            self.target_devices = self.compute_devices()
         summary = {"failure": [], "success": [], "discard": []}
         if self.iteration_devices and not self.iteration_run:
             if not self.workflow:
@@ -422,13 +609,31 @@ class Runner:
                 and not self.iteration_run
             ):
                 processes = min(len(non_skipped_targets), self.get("max_processes"))
-                process_args = [
-                    (device.id, self.runtime, results) for device in non_skipped_targets
-                ]
-                self.log("info", f"Starting a pool of {processes} threads")
                 self.in_process = True
-                with ThreadPool(processes=processes) as pool:
-                    pool.map(self.get_device_result, process_args)
+                if self.use_asyncio:
+                    self.log("info", f"Starting an event loop ({processes} jobs max)")
+                    results.extend(
+                        asyncio_run(
+                            self.async_device_run(non_skipped_targets, processes)
+                        )
+                    )
+                else:
+                    device_ids = [device.id for device in non_skipped_targets]
+                    batch_size = max(
+                        min(
+                            vs.settings["automation"]["device_batch_size"],
+                            len(device_ids) // (processes * 10),
+                        ),
+                        1,
+                    )
+                    process_args = [
+                        (device_ids[index : index + batch_size], self.runtime, results)
+                        for index in range(0, len(device_ids), batch_size)
+                    ]
+                    self.log("info", f"Starting a pool of {processes} threads")
+                    self.thread_context = copy_context()
+                    with ThreadPool(processes=processes) as pool:
+                        pool.map(self.get_device_result, process_args)
                 self.in_process = False
             else:
                 results.extend(
@@ -481,6 +686,7 @@ class Runner:
         if device:
             result_kw["device_id"] = device.id
         if self.is_main_run and not device:
+            self.flush_results()
             self.payload = self.make_json_compliant(self.payload)
             results["payload"] = self.payload
             services = list(vs.run_logs.get(self.parent_runtime, []))
@@ -508,6 +714,11 @@ class Runner:
         self.check_size_before_commit(results, "result")
         if not self.disable_result_creation or create_failed_results or run_result:
             self.has_result = True
+            if device and db.transactions["result_batch_size"]:
+                self.buffer_result(results, result_kw)
+                if commit:
+                    db.session.commit()
+                return results
             try:
                 db.factory(
                     "result", result=results, commit=commit, rbac=None, **result_kw
@@ -517,9 +728,48 @@ class Runner:
                 db.session.rollback()
         return results
 
+    def buffer_result(self, results, result_kw):
+        buffer = vs.run_results[self.parent_runtime]
+        buffer.append(
+            {
+                "result": results,
+                **dict.fromkeys(("workflow_id", "parent_device_id", "device_id")),
+                **{key: results[key] for key in ("duration", "runtime", "success")},
+                **result_kw,
+            }
+        )
+        if len(buffer) >= db.transactions["result_batch_size"]:
+            self.flush_results()
+
+    def flush_results(self):
+        buffer = vs.run_results.get(self.parent_runtime)
+        batch_size = db.transactions["result_batch_size"]
+        while buffer:
+            rows = []
+            try:
+                while len(rows) < batch_size:
+                    rows.append(buffer.popleft())
+            except IndexError:
+                pass
+            if not rows:
+                break
+            for index in range(db.retry_commit_number):
+                try:
+                    with db.session.begin_nested():
+                        db.session.execute(vs.models["result"].__table__.insert(), rows)
+                    break
+                except Exception as exc:
+                    if index == db.retry_commit_number - 1:
+                        error = f"{len(rows)} results discarded:\n{format_exc()}"
+                        self.log("critical", f"Failed to insert results ({error})")
+                    else:
+                        self.log("warning", f"Results insert n°{index} failed ({exc})")
+                        sleep(db.retry_commit_time * (index + 1))
+
     def run_service_job(self, device):
         args = (device,) if device else ()
         retries, total_retries = self.number_of_retries + 1, 0
+        results = None
         while retries and total_retries < self.max_number_of_retries:
             if self.stop:
                 self.log("error", f"ABORTING {device.name} (STOP)")
@@ -527,70 +777,146 @@ class Runner:
             retries -= 1
             total_retries += 1
             try:
-                if self.number_of_retries - retries:
-                    retry = self.number_of_retries - retries
-                    self.log("error", f"RETRY n°{retry}", device)
-                if self.service.preprocessing:
-                    try:
-                        self.eval(
-                            self.service.preprocessing, function="exec", **locals()
-                        )
-                    except SystemExit:
-                        pass
+                self.preprocess_service_job(
+                    results, device, retries, total_retries, args
+                )
                 try:
-                    results = self.service.job(self, *args)
+                    with self.profile("job", device):
+                        results = self.service.job(self, *args)
                 except Exception:
-                    result = "\n".join(format_exc().splitlines())
-                    self.log("error", result, device)
-                    results = {"success": False, "result": result}
-                results = self.convert_result(results)
-                if "success" not in results:
-                    results["success"] = True
-                if self.service.postprocessing:
-                    if (
-                        self.postprocessing_mode == "always"
-                        or self.postprocessing_mode == "failure"
-                        and not results["success"]
-                        or self.postprocessing_mode == "success"
-                        and results["success"]
-                    ):
-                        try:
-                            _, exec_variables = self.eval(
-                                self.service.postprocessing, function="exec", **locals()
-                            )
-                            if isinstance(exec_variables.get("retries"), int):
-                                retries = exec_variables["retries"]
-                        except SystemExit:
-                            pass
-                    else:
-                        log = (
-                            "Postprocessing was skipped as it is set to "
-                            f"{self.postprocessing_mode} only, and the service "
-                            f"{'passed' if results['success'] else 'failed'})"
-                        )
-                        self.log("warning", log, device)
-                run_validation = (
-                    self.validation_condition == "always"
-                    or self.validation_condition == "failure"
-                    and not results["success"]
-                    or self.validation_condition == "success"
-                    and results["success"]
+                    results = self.log_job_exception(device)
+                results, retries = self.postprocess_service_job(
+                    results, device, retries, total_retries, args
                 )
-                if run_validation:
-                    section = self.eval(self.validation_section, results=results)[0]
-                    results.update(self.validate_result(section, device))
-                    if self.negative_logic:
-                        results["success"] = not results["success"]
                 if results["success"]:
                     return results
                 elif retries:
                     sleep(self.time_between_retries)
             except Exception:
-                result = "\n".join(format_exc().splitlines())
-                self.log("error", result, device)
-                results = {"success": False, "result": result}
+                results = self.log_job_exception(device)
+        return results
+
+    async def run_async_service_job(self, device):
+        args = (device,)
+        retries, total_retries = self.number_of_retries + 1, 0
+        results = None
+        while retries and total_retries < self.max_number_of_retries:
+            if self.stop:
+                self.log("error", f"ABORTING {device.name} (STOP)")
+                return {"success": False, "result": "Aborted"}
+            retries -= 1
+            total_retries += 1
+            try:
+                await self.run_sync(
+                    self.preprocess_service_job,
+                    results,
+                    device,
+                    retries,
+                    total_retries,
+                    args,
+                )
+                try:
+                    with self.profile("job", device):
+                        results = await self.service.async_job(self, device)
+                except Exception:
+                    results = self.log_job_exception(device)
+                results, retries = await self.run_sync(
+                    self.postprocess_service_job,
+                    results,
+                    device,
+                    retries,
+                    total_retries,
+                    args,
+                )
+                if results["success"]:
+                    return results
+                elif retries:
+                    await asyncio_sleep(self.time_between_retries)
+            except Exception:
+                results = self.log_job_exception(device)
         return results
 
+    def log_job_exception(self, device):
+        result = "\n".join(format_exc().splitlines())
+        self.log("error", result, device)
+        return {"success": False, "result": result}
+
+    def preprocess_service_job(self, results, device, retries, total_retries, args):
+        retry = self.number_of_retries - retries
+        if retry:
+            self.log("error", f"RETRY n°{retry}", device)
+        if self.service.preprocessing:
+            try:
+                with self.profile("preprocessing", device):
+                    self.eval(self.service.preprocessing, function="exec", **locals())
+            except SystemExit:
+                pass
+
+    def postprocess_service_job(self, results, device, retries, total_retries, args):
+        results = self.convert_result(results)
+        if "success" not in results:
+            results["success"] = True
+        if self.service.postprocessing:
+            if (
+                self.postprocessing_mode == "always"
+                or self.postprocessing_mode == "failure"
+                and not results["success"]
+                or self.postprocessing_mode == "success"
+                and results["success"]
+            ):
+                try:
+                    with self.profile("postprocessing", device):
+                        _, exec_variables = self.eval(
+                            self.service.postprocessing, function="exec", **locals()
+                        )
+                    if isinstance(exec_variables.get("retries"), int):
+                        retries = exec_variables["retries"]
+                except SystemExit:
+                    pass
+            else:
+                log = (
+                    "Postprocessing was skipped as it is set to "
+                    f"{self.postprocessing_mode} only, and the service "
+                    f"{'passed' if results['success'] else 'failed'})"
+                )
+                self.log("warning", log, device)
+        run_validation = (
+            self.validation_condition == "always"
+            or self.validation_condition == "failure"
+            and not results["success"]
+            or self.validation_condition == "success"
+            and results["success"]
+        )
+        if run_validation:
+            with self.profile("validation", device):
+                section = self.eval(self.validation_section, results=results)[0]
+                results.update(self.validate_result(section, device))
+            if self.negative_logic:
+                results["success"] = not results["success"]
+        return results, retries
+
+    def get_iteration_targets(self, device):
+        targets = self.eval(self.service.iteration_values, **locals())[0]
+        if not isinstance(targets, dict):
+            if isinstance(targets, (GeneratorType, map, filter)):
+                targets = list(targets)
+            targets = dict(zip(map(str, targets), targets))
+        for target_name, target_value in targets.items():
+            self.payload_helper(
+                self.iteration_variable_name,
+                target_value,
+                device=getattr(device, "name", None),
+            )
+            yield target_name
+
+    @staticmethod
+    def get_iteration_results(targets_results):
+        return {
+            "result": targets_results,
+            "success": all(result["success"] for result in targets_results.values()),
+        }
+
+    @_profile_device
     def get_results(self, device=None, commit=True):
         self.log("info", "STARTING", device)
         start = datetime.now().replace(microsecond=0)
@@ -599,49 +925,87 @@ class Runner:
             return {"success": False, **results}
         try:
             if self.service.iteration_values:
-                targets_results = {}
-                targets = self.eval(self.service.iteration_values, **locals())[0]
-                if not isinstance(targets, dict):
-                    if isinstance(targets, (GeneratorType, map, filter)):
-                        targets = list(targets)
-                    targets = dict(zip(map(str, targets), targets))
-                for target_name, target_value in targets.items():
-                    self.payload_helper(
-                        self.iteration_variable_name,
-                        target_value,
-                        device=getattr(device, "name", None),
-                    )
-                    targets_results[target_name] = self.run_service_job(device)
-                results.update(
-                    {
-                        "result": targets_results,
-                        "success": all(
-                            result["success"] for result in targets_results.values()
-                        ),
-                    }
-                )
+                targets_results = {
+                    target: self.run_service_job(device)
+                    for target in self.get_iteration_targets(device)
+                }
+                results.update(self.get_iteration_results(targets_results))
             else:
                 results.update(self.run_service_job(device))
         except Exception:
             formatted_error = "\n".join(format_exc().splitlines())
             results.update({"success": False, "result": formatted_error})
             self.log("error", formatted_error, device)
+        self.end_device_job(results, start, device, commit)
+        if self.waiting_time:
+            self.log("info", f"SLEEP {self.waiting_time} seconds...", device)
+            sleep(self.waiting_time)
+        return results
+
+    @_profile_device
+    async def get_async_results(self, device):
+        self.log("info", "STARTING", device)
+        start = datetime.now().replace(microsecond=0)
+        results = {"device_target": device.name}
+        if self.stop:
+            return {"success": False, **results}
+        try:
+            if self.service.iteration_values:
+                targets_results, targets = {}, self.get_iteration_targets(device)
+                while True:
+                    target = await self.run_sync(next, targets, StopIteration)
+                    if target is StopIteration:
+                        break
+                    targets_results[target] = await self.run_async_service_job(device)
+                results.update(self.get_iteration_results(targets_results))
+            else:
+                results.update(await self.run_async_service_job(device))
+        except Exception:
+            formatted_error = "\n".join(format_exc().splitlines())
+            results.update({"success": False, "result": formatted_error})
+            self.log("error", formatted_error, device)
+        await self.close_async_connections(device.name)
+        await self.run_sync(self.end_device_job, results, start, device, commit=False)
+        if self.waiting_time:
+            self.log("info", f"SLEEP {self.waiting_time} seconds...", device)
+            await asyncio_sleep(self.waiting_time)
+        return results
+
+    async def async_device_run(self, devices, concurrency):
+        self.async_connections, semaphore = defaultdict(dict), Semaphore(concurrency)
+
+        async def device_job(device):
+            async with semaphore:
+                return await self.get_async_results(device)
+
+        with ThreadPoolExecutor(max_workers=1) as self.sync_executor:
+            results = await gather(*(device_job(device) for device in devices))
+            with self.profile("commit"):
+                await self.run_sync(db.session.commit)
+                await self.run_sync(db.session.remove)
+                db.session.commit()
+        return results
+
+    async def run_sync(self, function, *args, **kwargs):
+        return await get_running_loop().run_in_executor(
+            self.sync_executor, partial(copy_context().run, function, *args, **kwargs)
+        )
+
+    def end_device_job(self, results, start, device, commit):
         results["duration"] = str(datetime.now().replace(microsecond=0) - start)
         if device:
             if getattr(self, "close_connection", False) or self.is_main_run:
                 self.close_device_connection(device.name)
             status = "success" if results["success"] else "failure"
             self.write_state(f"{self.progress_key}/{status}", 1, "increment")
-            self.create_result(
-                {"runtime": vs.get_time(), **results}, device, commit=commit
-            )
+            env.increment("enms_device_jobs_total", status=status)
+            with self.profile("create_result", device):
+                self.create_result(
+                    {"runtime": vs.get_time(), **results}, device, commit=commit
+                )
         self.log("info", "FINISHED", device)
-        if self.waiting_time:
-            self.log("info", f"SLEEP {self.waiting_time} seconds...", device)
-            sleep(self.waiting_time)
         if not results["success"]:
             self.write_state("success", False)
-        return results
 
     def log(
         self,
@@ -778,15 +1142,16 @@ class Runner:
 
     def get_credentials(self, device, add_secret=True):
         result, credential_type = {}, self.main_run.service.credential_type
-        if self.credentials == "object":
-            credential = self.named_credential
-        else:
-            credential = db.get_credential(
-                self.creator,
-                device=device,
-                credential_type=credential_type,
-                optional=self.credentials != "device",
-            )
+        with self.profile("credentials", device):
+            if self.credentials == "object":
+                credential = self.named_credential
+            else:
+                credential = db.get_credential(
+                    self.creator,
+                    device=device,
+                    credential_type=credential_type,
+                    optional=self.credentials != "device",
+                )
         if credential:
             device_log = f" for '{device.name}'" if device else ""
             self.log("info", f"Using '{credential.name}' credential{device_log}")
@@ -917,6 +1282,8 @@ class Runner:
         return self.payload_helper(*args, operation="get", **kwargs)
 
     def get_result(self, service_name, device=None, workflow=None, all_matches=False):
+        self.flush_results()
+
         def filter_run(query, property):
             query = query.filter(
                 vs.models["result"].service.has(
@@ -953,6 +1320,7 @@ class Runner:
         return recursive_search(self.main_run)
 
     def get_all_results(self):
+        self.flush_results()
         return db.fetch_all("result", parent_runtime=self.parent_runtime)
 
     @staticmethod
@@ -981,50 +1349,70 @@ class Runner:
         credential_dict["secret"] = env.get_password(credential.enable_password)
         return credential_dict
 
+    def get_base_namespace(self):
+        if "base_namespace" in self.__dict__:
+            return self.base_namespace
+        self.base_namespace = {
+            "__builtins__": {**builtins, "__import__": self._import},
+            "delete": partial(self.database_function, "delete"),
+            "dict_to_string": vs.dict_to_string,
+            "encrypt": env.encrypt_password,
+            "factory": partial(self.database_function, "factory"),
+            "fetch": partial(self.database_function, "fetch"),
+            "fetch_all": partial(self.database_function, "fetch_all"),
+            "get_all_results": self.get_all_results,
+            "get_connection": self.get_connection,
+            "get_result": self.get_result,
+            "get_var": self.get_var,
+            "log": self.log,
+            "placeholder": self.main_run.placeholder,
+            "prepend_filepath": self.prepend_filepath,
+            "send_email": env.send_email,
+            "server": {
+                "ip_address": vs.server_ip,
+                "name": vs.server,
+                "url": vs.server_url,
+            },
+            "set_var": self.payload_helper,
+            "user": self.creator_dict,
+            "workflow": self.workflow,
+        }
+        if self.is_admin_run:
+            self.base_namespace["get_credential"] = self.get_credential
+        return self.base_namespace
+
     def global_variables(_self, **locals):  # noqa: N805
         payload, device = _self.payload, locals.get("device")
-        variables = {**locals, **payload.get("form", {})}
-        variables.update(payload.get("variables", {}))
-        if device and "devices" in payload.get("variables", {}):
-            variables.update(payload["variables"]["devices"].get(device.name, {}))
+        payload_variables = payload.get("variables", {})
+        scopes = [locals, payload.get("form", {}), payload_variables]
+        if device and "devices" in payload_variables:
+            scopes.append(payload_variables["devices"].get(device.name, {}))
+        base_namespace = _self.get_base_namespace()
+        variables = base_namespace.copy()
+        for scope in scopes:
+            variables.update(
+                (key, scope[key]) for key in scope.keys() - base_namespace.keys()
+            )
         variables.update(
             {
-                "__builtins__": {**builtins, "__import__": _self._import},
-                "delete": partial(_self.database_function, "delete"),
                 "devices": _self.target_devices,
-                "dict_to_string": vs.dict_to_string,
-                "encrypt": env.encrypt_password,
-                "factory": partial(_self.database_function, "factory"),
-                "fetch": partial(_self.database_function, "fetch"),
-                "fetch_all": partial(_self.database_function, "fetch_all"),
-                "get_all_results": _self.get_all_results,
-                "get_connection": _self.get_connection,
-                "get_result": _self.get_result,
-                "get_var": _self.get_var,
-                "log": _self.log,
                 "parent_device": _self.parent_device or device,
                 "payload": _self.payload,
-                "placeholder": _self.main_run.placeholder,
-                "prepend_filepath": _self.prepend_filepath,
-                "send_email": env.send_email,
-                "server": {
-                    "ip_address": vs.server_ip,
-                    "name": vs.server,
-                    "url": vs.server_url,
-                },
-                "set_var": _self.payload_helper,
-                "user": _self.creator_dict,
-                "workflow": _self.workflow,
             }
         )
-        if _self.is_admin_run:
-            variables["get_credential"] = _self.get_credential
         return variables
 
+    @staticmethod
+    @lru_cache(maxsize=vs.settings["automation"]["code_cache_size"])
+    def compile_code(query, function):
+        return builtins["compile"](query, "<string>", function)
+
     def eval(_self, query, function="eval", **locals):  # noqa: N805
         exec_variables = _self.global_variables(**locals)
-        results = builtins[function](query, exec_variables) if query else ""
-        return results, exec_variables
+        if not query:
+            return "", exec_variables
+        code = _self.compile_code(query, function)
+        return builtins[function](code, exec_variables), exec_variables
 
     def sub(self, input, variables):
         regex = compile("{{(.*?)}}")
@@ -1077,8 +1465,11 @@ class Runner:
             self.log("error", f"Failed to honor the config mode {exc}")
         return connection
 
+    @_instrument_connection("netmiko")
     def netmiko_connection(self, device):
-        connection = self.get_or_close_connection("netmiko", device.name)
+        connection = self.get_or_close_connection(
+            "netmiko", device.name
+        ) or self.get_pooled_connection("netmiko", device)
         connection_name = f"Netmiko Connection '{self.connection_name}'"
         if connection:
             self.log("info", f"Using cached {connection_name}", device)
@@ -1138,8 +1529,11 @@ class Runner:
         )[self.connection_name] = netmiko_connection
         return netmiko_connection
 
+    @_instrument_connection("scrapli")
     def scrapli_connection(self, device):
-        connection = self.get_or_close_connection("scrapli", device.name)
+        connection = self.get_or_close_connection(
+            "scrapli", device.name
+        ) or self.get_pooled_connection("scrapli", device)
         connection_name = f"Scrapli Connection '{self.connection_name}'"
         if connection:
             self.log("info", f"Using cached {connection_name}", device)
@@ -1162,6 +1556,7 @@ class Runner:
                 {
                     "transport": self.transport,
                     "platform": platform,
+                    "port": device.port,
                     "timeout_socket": self.timeout_socket,
                     "timeout_transport": self.timeout_transport,
                     "timeout_ops": self.timeout_ops,
@@ -1180,8 +1575,11 @@ class Runner:
         )[self.connection_name] = connection
         return connection
 
+    @_instrument_connection("napalm")
     def napalm_connection(self, device):
-        connection = self.get_or_close_connection("napalm", device.name)
+        connection = self.get_or_close_connection(
+            "napalm", device.name
+        ) or self.get_pooled_connection("napalm", device)
         connection_name = f"NAPALM Connection '{self.connection_name}'"
         if connection:
             self.log("info", f"Using cached {connection_name}", device)
@@ -1214,8 +1612,11 @@ class Runner:
         ] = napalm_connection
         return napalm_connection
 
+    @_instrument_connection("ncclient")
     def ncclient_connection(self, device):
-        connection = self.get_or_close_connection("ncclient", device.name)
+        connection = self.get_or_close_connection(
+            "ncclient", device.name
+        ) or self.get_pooled_connection("ncclient", device)
         connection_name = f"NCClient Connection '{self.connection_name}'"
         if connection:
             self.log("info", f"Using cached {connection_name}", device)
@@ -1242,6 +1643,76 @@ class Runner:
         )[self.connection_name] = ncclient_connection
         return ncclient_connection
 
+    async def async_scrapli_connection(self, device):
+        connections = self.async_connections[device.name]
+        if "scrapli" in connections:
+            return connections["scrapli"]
+        self.log(
+            "info",
+            "OPENING Async Scrapli Connection",
+            device,
+            change_log=False,
+            logger="security",
+        )
+        credentials = await self.run_sync(self.get_credentials, device)
+        platform = device.scrapli_driver if self.driver == "device" else self.driver
+        connection = AsyncScrapli(
+            host=device.ip_address,
+            port=device.port,
+            auth_username=credentials["username"],
+            auth_password=credentials["password"],
+            transport="asyncssh",
+            platform=platform,
+            timeout_socket=self.timeout_socket,
+            timeout_transport=self.timeout_transport,
+            timeout_ops=self.timeout_ops,
+            **vs.automation["scrapli"]["connection_args"],
+        )
+        await connection.open()
+        connections["scrapli"] = connection
+        return connection
+
+    async def asyncssh_connection(self, device):
+        connections = self.async_connections[device.name]
+        if "asyncssh" in connections:
+            return connections["asyncssh"]
+        self.log(
+            "info",
+            "OPENING Asyncssh Connection",
+            device,
+            change_log=False,
+            logger="security",
+        )
+        credentials = await self.run_sync(
+            self.get_credentials, device, add_secret=False
+        )
+        if "pkey" in credentials:
+            private_key = StringIO()
+            credentials.pop("pkey").write_private_key(private_key)
+            credentials["client_keys"] = [import_private_key(private_key.getvalue())]
+        connection = await asyncssh_connect(
+            device.ip_address,
+            port=device.port,
+            known_hosts=None,
+            connect_timeout=self.conn_timeout,
+            **credentials,
+        )
+        connections["asyncssh"] = connection
+        return connection
+
+    async def close_async_connections(self, device):
+        for library, connection in self.async_connections.pop(device, {}).items():
+            try:
+                if library == "asyncssh":
+                    connection.close()
+                    await connection.wait_closed()
+                else:
+                    await connection.close()
+                self.log("info", f"Closed {library} async connection", device)
+            except Exception as exc:
+                log = f"Error while closing {library} async connection ({exc})"
+                self.log("error", log, device)
+
     def get_or_close_connection(self, library, device):
         connection = self.get_connection(library, device)
         if not connection:
@@ -1274,36 +1745,44 @@ class Runner:
         return cache.get(device, {}).get(connection)
 
     def close_device_connection(self, device):
+        release = self.is_main_run and not getattr(self, "close_connection", False)
         for library in ("netmiko", "napalm", "scrapli", "ncclient"):
             connection = self.get_connection(library, device)
-            if connection:
+            if not connection:
+                continue
+            if not release or not self.release_connection(library, device, connection):
                 self.disconnect(library, device, connection)
 
     def close_remaining_connections(self):
-        threads = []
+        connections = []
         for library in ("netmiko", "napalm", "scrapli", "ncclient"):
             device_connections = vs.connections_cache[library][self.parent_runtime]
-            for device, connections in list(device_connections.items()):
-                for connection in list(connections.values()):
-                    args = (library, device, connection)
-                    thread = Thread(target=self.disconnect, args=args)
-                    thread.start()
-                    threads.append(thread)
-        for thread in threads:
-            thread.join()
+            for device, named_connections in list(device_connections.items()):
+                for name, connection in list(named_connections.items()):
+                    if not self.release_connection(library, device, connection, name):
+                        connections.append((library, device, connection, name))
+        executor = self.get_teardown_executor()
+        wait([executor.submit(self.disconnect, *args) for args in connections])
         for library in ("netmiko", "napalm", "scrapli", "ncclient"):
             vs.connections_cache[library].pop(self.parent_runtime)
+        for key in list(vs.connection_pool_keys):
+            if key[0] == self.parent_runtime:
+                vs.connection_pool_keys.pop(key, None)
 
-    def disconnect(self, library, device, connection):
-        connection_name = getattr(self, "connection_name", "default")
+    @staticmethod
+    def close_library_connection(library, connection):
+        if library == "netmiko":
+            connection.disconnect()
+        elif library == "ncclient":
+            connection.close_session()
+        else:
+            connection.close()
+
+    def disconnect(self, library, device, connection, name=None):
+        connection_name = name or getattr(self, "connection_name", "default")
         connection_log = f"{library} connection '{connection_name}'"
         try:
-            if library == "netmiko":
-                connection.disconnect()
-            elif library == "ncclient":
-                connection.close_session()
-            else:
-                connection.close()
+            self.close_library_connection(library, connection)
             vs.connections_cache[library][self.parent_runtime][device].pop(
                 connection_name
             )
@@ -1311,6 +1790,114 @@ class Runner:
         except Exception as exc:
             self.log("error", f"Error while closing {connection_log} ({exc})", device)
 
+    @staticmethod
+    def get_teardown_executor():
+        if not vs.connection_teardown_executor:
+            vs.connection_teardown_executor = ThreadPoolExecutor(
+                max_workers=vs.settings["automation"]["connection_pool"][
+                    "teardown_threads"
+                ],
+                thread_name_prefix="connection_teardown",
+            )
+        return vs.connection_teardown_executor
+
+    def get_connection_pool_key(self, library, device):
+        digests = self.__dict__.setdefault("connection_pool_digests", {})
+        if device.name not in digests:
+            credentials = self.get_credentials(device)
+            if "pkey" in credentials:
+                credentials["pkey"] = credentials["pkey"].get_base64()
+            credentials["driver"] = getattr(self, "driver", None)
+            digests[device.name] = db.get_digest(dumps(credentials, sort_keys=True))
+        return (library, device.name, self.connection_name, digests[device.name])
+
+    def get_pooled_connection(self, library, device):
+        if (
+            not vs.settings["automation"]["connection_pool"]["enabled"]
+            or self.start_new_connection
+        ):
+            return
+        key = self.get_connection_pool_key(library, device)
+        run_key = (self.parent_runtime, library, device.name, self.connection_name)
+        vs.connection_pool_keys[run_key] = key
+        with vs.connection_pool_lock:
+            entry = vs.connection_pool.pop(key, None)
+            if not entry:
+                vs.connection_pool_metrics[f"{library}_miss"] += 1
+        if not entry:
+            return
+        vs.connections_cache[library][self.parent_runtime].setdefault(device.name, {})[
+            self.connection_name
+        ] = entry["connection"]
+        connection = self.get_or_close_connection(library, device.name)
+        status = "hit" if connection else "stale"
+        with vs.connection_pool_lock:
+            vs.connection_pool_metrics[f"{library}_{status}"] += 1
+        if connection:
+            self.log("info", f"Reusing pooled {library} connection", device)
+        return connection
+
+    def release_connection(self, library, device, connection, name=None):
+        name = name or getattr(self, "connection_name", "default")
+        run_key = (self.parent_runtime, library, device, name)
+        key = vs.connection_pool_keys.pop(run_key, None)
+        if not key or not vs.settings["automation"]["connection_pool"]["enabled"]:
+            return False
+        vs.connections_cache[library][self.parent_runtime][device].pop(name, None)
+        max_size = vs.settings["automation"]["connection_pool"]["max_size"]
+        with vs.connection_pool_lock:
+            evicted = [vs.connection_pool.pop(key, None)]
+            vs.connection_pool[key] = {
+                "library": library,
+                "connection": connection,
+                "last_used": time(),
+            }
+            while len(vs.connection_pool) > max_size:
+                evicted.append(vs.connection_pool.pop(next(iter(vs.connection_pool))))
+            vs.connection_pool_metrics[f"{library}_released"] += 1
+            vs.connection_pool_metrics[f"{library}_evicted"] += len(evicted) - 1
+        self.teardown_pooled_connections(evicted)
+        self.log("info", f"Released {library} connection '{name}' to the pool", device)
+        if not vs.connection_pool_reaper:
+            vs.connection_pool_reaper = Thread(
+                target=self.reap_pooled_connections, daemon=True
+            )
+            vs.connection_pool_reaper.start()
+        return True
+
+    @classmethod
+    def reap_pooled_connections(cls):
+        while True:
+            idle_timeout = vs.settings["automation"]["connection_pool"]["idle_timeout"]
+            sleep(max(idle_timeout / 2, 1))
+            now = time()
+            with vs.connection_pool_lock:
+                expired = [
+                    vs.connection_pool.pop(key)
+                    for key, entry in list(vs.connection_pool.items())
+                    if now - entry["last_used"] > idle_timeout
+                ]
+                for entry in expired:
+                    vs.connection_pool_metrics[f"{entry['library']}_expired"] += 1
+            cls.teardown_pooled_connections(expired)
+
+    @classmethod
+    def teardown_pooled_connections(cls, entries):
+        executor = cls.get_teardown_executor()
+        for entry in entries:
+            if not entry:
+                continue
+            executor.submit(
+                cls.close_pooled_connection, entry["library"], entry["connection"]
+            )
+
+    @classmethod
+    def close_pooled_connection(cls, library, connection):
+        try:
+            cls.close_library_connection(library, connection)
+        except Exception as exc:
+            env.log("error", f"Error while closing pooled {library} connection ({exc})")
+
     def enter_remote_device(self, connection, device):
         if not getattr(self, "jump_on_connect", False):
             return
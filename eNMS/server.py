@@ -8,7 +8,9 @@ from flask import (
     render_template,
     render_template_string,
     request,
+    Response,
     send_file,
+    stream_with_context,
     url_for,
     session,
 )
@@ -17,6 +19,7 @@ from flask_wtf.csrf import CSRFProtect
 from functools import wraps
 from importlib import import_module
 from io import BytesIO
+from json import loads
 from logging import info
 from os import getenv, remove
 from pathlib import Path
@@ -154,15 +157,32 @@ class Server(Flask):
                 status_code = 403
             else:
                 try:
-                    result = function(*args, **kwargs)
+                    with db.inspect_queries(
+                        f"{request.method} {request.path}", "request"
+                    ) as queries:
+                        result = function(*args, **kwargs)
+                    query_report, budget_exceeded = db.query_report(queries)
+                    if query_report:
+                        env.log("warning", query_report, change_log=False)
+                    if budget_exceeded:
+                        raise db.query_budget_error(query_report)
+                    vs.models["pool"].apply_pool_updates()
                     status_code = 200
                 except (db.rbac_error, Forbidden):
                     status_code = 403
                 except NotFound:
                     status_code = 404
                 except Exception:
+                    db.session.rollback()
                     status_code, traceback = 500, format_exc()
             time_difference = (datetime.now() - time_before).total_seconds()
+            env.observe(
+                "enms_request_duration_seconds",
+                time_difference,
+                endpoint=endpoint if endpoint_rbac else "unknown",
+                method=request.method,
+                status=status_code,
+            )
             log = (
                 f"USER: {username} ({client_address}) - {time_difference:.3f}s - "
                 f"{request.method} {request.path} ({status_code})"
@@ -345,6 +365,28 @@ class Server(Flask):
             filename = f"/{controller.export_service(id)}.tgz"
             return send_file(filename, as_attachment=True)
 
+        @blueprint.route("/export_table/<model>", methods=["POST"])
+        @self.process_requests
+        def export_table(model):
+            kwargs = (
+                request.json if request.is_json else loads(request.form["parameters"])
+            )
+            export_format = kwargs.get("export_format", "csv")
+            filename = f"{model}.{export_format}"
+            lines = controller.stream_table_export(model, **kwargs)
+
+            def stream_rows():
+                try:
+                    yield from lines
+                finally:
+                    db.session.close()
+
+            return Response(
+                stream_with_context(stream_rows()),
+                mimetype="text/csv" if export_format == "csv" else "text/plain",
+                headers={"Content-Disposition": f"attachment; filename={filename}"},
+            )
+
         @blueprint.route("/terminal/<session>")
         @self.process_requests
         def ssh_connection(session):
@@ -371,7 +413,8 @@ class Server(Flask):
                 kwargs = request.args.to_dict()
             with db.session_scope():
                 endpoint = self.rest_api.rest_endpoints[method][endpoint]
-                return jsonify(getattr(self.rest_api, endpoint)(*args, **kwargs))
+                result = getattr(self.rest_api, endpoint)(*args, **kwargs)
+                return result if isinstance(result, Response) else jsonify(result)
 
         @blueprint.route("/", methods=["POST"])
         @blueprint.route("/<path:page>", methods=["POST"])
@@ -21,6 +21,7 @@ import {
   notify,
   observeMutations,
   openPanel,
+  sanitize,
   serializeForm,
   showInstancePanel,
 } from "./base.js";
@@ -278,6 +279,8 @@ export const showRuntimePanel = function(
       ? displayLogs
       : type == "report"
       ? displayReport
+      : type == "timings"
+      ? displayTimings
       : service.type == "workflow" && !table
       ? displayResultsTree
       : displayResultsTable;
@@ -286,6 +289,8 @@ export const showRuntimePanel = function(
       ? "logs"
       : type == "report"
       ? "report"
+      : type == "timings"
+      ? "timings"
       : service.type == "workflow" && !table
       ? "tree"
       : "table";
@@ -296,7 +301,7 @@ export const showRuntimePanel = function(
       if (newRuntime) runtimes.push([runtime, runtime]);
       if (!runtimes.length) return notify(`No ${type} yet.`, "error", 5);
       let content;
-      if (panelType == "logs" || panelType == "report") {
+      if (["logs", "report", "timings"].includes(panelType)) {
         content = `
         <div class="modal-body">
           <nav
@@ -451,6 +456,62 @@ function displayReport(service, runtime, change) {
   });
 }
 
+function timingNode(node, total) {
+  const width = total ? (100 * node.duration) / total : 100;
+  const childrenTotal = node.children.reduce((sum, child) => sum + child.duration, 0);
+  const label = `${sanitize(node.name)}: ${node.duration.toFixed(3)}s (${node.count})`;
+  const children = node.children
+    .map((child) => timingNode(child, Math.max(node.duration, childrenTotal)))
+    .join("");
+  return `
+    <div style="width: ${width}%; min-width: 1px; overflow: hidden;">
+      <div
+        title="${label}"
+        style="background: #f0ad4e; border: 1px solid #fff; height: 22px;
+        overflow: hidden; white-space: nowrap; font-size: 11px; padding: 2px;"
+      >${label}</div>
+      <div style="display: flex;">${children}</div>
+    </div>`;
+}
+
+function displayTimings(service, runtime) {
+  call({
+    url: `/get_run_timings/${service.id}/${runtime}`,
+    callback: function(timings) {
+      if (!timings.tree?.length) {
+        $(`#service-timings-${service.id}`).html(
+          "No timings: profiling was not enabled for this run."
+        );
+        return;
+      }
+      const phases = ["job", "credentials", "preprocessing", "postprocessing"];
+      phases.push("validation", "create_result");
+      const rows = timings.devices.map((device) => {
+        const connection = Object.keys(device)
+          .filter((phase) => phase.includes("_connection_"))
+          .reduce((sum, phase) => sum + device[phase], 0);
+        const cells = [device.device || 0, connection]
+          .concat(phases.map((phase) => device[phase] || 0))
+          .map((duration) => `<td>${duration.toFixed(3)}</td>`);
+        return `<tr><td>${sanitize(device.name)}</td>${cells.join("")}</tr>`;
+      });
+      $(`#service-timings-${service.id}`).html(`
+        ${timings.tree.map((node) => timingNode(node, node.duration)).join("")}
+        <hr>
+        <table class="table table-striped table-bordered table-hover">
+          <thead>
+            <tr>
+              <th>Slowest devices</th><th>Total</th><th>connection</th>
+              ${phases.map((phase) => `<th>${phase}</th>`).join("")}
+            </tr>
+          </thead>
+          <tbody>${rows.join("")}</tbody>
+        </table>
+      `);
+    },
+  });
+}
+
 function displayLogs(service, runtime, change) {
   let editor;
   if (change) {
@@ -790,6 +851,7 @@ Object.assign(action, {
   "Parameterized Run": (service) =>
     runService({ id: service.id, parametrization: true }),
   Logs: (service) => showRuntimePanel("logs", service, currentRuntime),
+  Timings: (service) => showRuntimePanel("timings", service, currentRuntime),
   Reports: (service) => showRuntimePanel("report", service, currentRuntime),
   Results: (service) => showRuntimePanel("results", service, currentRuntime, "result"),
 });
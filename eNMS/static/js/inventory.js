@@ -314,7 +314,10 @@ function showGitConfiguration(device, commit) {
 function showGitHistory(device) {
   call({
     url: `/get_git_history/${device.id}`,
-    callback: (commits) => {
+    callback: ({ history: commits, stale_index: staleIndex }) => {
+      if (staleIndex) {
+        notify("The Git history index is not up to date.", "warning", 5);
+      }
       if (Object.keys(configurationProperties).some((p) => commits[p].length)) {
         openPanel({
           name: "git_history",
@@ -1,6 +1,7 @@
 /*
 global
 applicationPath: false
+csrf_token: false
 filePath: false
 settings: false
 tableProperties: false
@@ -12,7 +13,6 @@ import {
   copyToClipboard,
   createTooltip,
   createTooltips,
-  downloadFile,
   loadTypes,
   notify,
   openPanel,
@@ -144,7 +144,6 @@ export class Table {
         contentType: "application/json",
         data: (data) => {
           Object.assign(data, {
-            export: self.csvExport,
             clipboard: self.copyClipboard,
             pagination: self.displayPagination,
             ...this.getFilteringData(),
@@ -157,10 +156,6 @@ export class Table {
             notify(result.error, "error", 5);
             return [];
           }
-          if (self.csvExport) {
-            self.exportTable(result.full_result);
-            self.csvExport = false;
-          }
           if (self.copyClipboard) {
             copyToClipboard({ text: result.full_result, includeText: false });
             self.copyClipboard = false;
@@ -181,25 +176,14 @@ export class Table {
     return [0, "asc"];
   }
 
-  exportTable(result) {
-    const visibleColumns = this.columns
+  get exportColumns() {
+    return this.columns
       .filter((column) => {
         const isExportable = typeof column.export === "undefined" || column.export;
         const visibleColumn = this.table.column(`${column.name}:name`).visible();
         return isExportable && visibleColumn;
       })
       .map((column) => column.name);
-    result = result.map((instance) => {
-      Object.keys(instance).forEach((key) => {
-        if (!visibleColumns.includes(key)) delete instance[key];
-      });
-      return visibleColumns.map((column) => `"${instance[column]}"`);
-    });
-    downloadFile(
-      this.type,
-      [visibleColumns, ...result].map((e) => e.join(",")).join("\n"),
-      "csv"
-    );
   }
 
   getFilteringData() {
@@ -1105,7 +1089,7 @@ tables.run = class RunTable extends Table {
 
   buttons(row) {
     return [
-      `<ul class="pagination pagination-lg" style="margin: 0px; width: 150px">
+      `<ul class="pagination pagination-lg" style="margin: 0px; width: 185px">
         <li>
           <button type="button" class="btn btn-sm btn-info"
           onclick="eNMS.automation.showRuntimePanel('logs', ${row.service},
@@ -1124,6 +1108,12 @@ tables.run = class RunTable extends Table {
           '${row.runtime}')" data-tooltip="Results">
           <span class="glyphicon glyphicon-list-alt"></span></button>
         </li>
+        <li>
+          <button type="button" class="btn btn-sm btn-info"
+          onclick="eNMS.automation.showRuntimePanel('timings', ${row.service},
+          '${row.runtime}')" data-tooltip="Timings">
+          <span class="glyphicon glyphicon-time"></span></button>
+        </li>
         <li>
           <button type="button" class="btn btn-sm btn-danger"
           onclick="eNMS.automation.stopRun('${row.runtime}')"
@@ -1770,10 +1760,40 @@ function copySelectionToClipboard(tableId) {
   refreshTable(tableId);
 }
 
-function exportTable(tableId) {
-  let table = tableInstances[tableId];
-  table.csvExport = true;
-  refreshTable(tableId);
+function exportTable(tableId, exportFormat = "csv") {
+  const table = tableInstances[tableId];
+  const parameters = table.table.ajax.params();
+  $(`iframe[name=export-${tableId}]`).remove();
+  const frame = $("<iframe>", { name: `export-${tableId}`, style: "display: none" });
+  frame.on("load", function() {
+    try {
+      const response = JSON.parse(this.contentDocument.body.textContent);
+      if (response.alert) notify(`Export failed (${response.alert})`, "error", 5);
+    } catch (error) {
+      notify("Export failed.", "error", 5);
+    }
+  });
+  const form = $("<form>", {
+    action: `/export_table/${table.model}`,
+    method: "POST",
+    target: `export-${tableId}`,
+  });
+  const data = {
+    csrf_token: csrf_token,
+    parameters: JSON.stringify({
+      columns: parameters.columns,
+      order: parameters.order,
+      ...table.getFilteringData(),
+      ...table.filteringData,
+      export_columns: table.exportColumns,
+      export_format: exportFormat,
+    }),
+  };
+  for (const [name, value] of Object.entries(data)) {
+    form.append($("<input>", { type: "hidden", name: name, value: value }));
+  }
+  $("body").append(frame, form);
+  form.submit().remove();
 }
 
 export const refreshTable = function(tableId, notification, updateParent, firstPage) {
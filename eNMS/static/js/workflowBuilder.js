@@ -502,6 +502,7 @@ export function updateWorkflowRightClickBindings() {
     "Workflow Report": () => showRuntimePanel("report", workflow),
     "Workflow Result Comparison": () => compareWorkflowResults(),
     "Workflow Logs": () => showRuntimePanel("logs", workflow),
+    "Workflow Timings": () => showRuntimePanel("timings", workflow),
     "Add to Workflow": addServicePanel,
     "Stop Workflow": () => stopWorkflow(),
     "Runtimes Display": flipRuntimeDisplay,
@@ -1,4 +1,4 @@
-from collections import defaultdict
+from collections import defaultdict, deque
 from datetime import datetime
 from git import Repo
 from json import load
@@ -15,6 +15,7 @@ from warnings import warn
 from wtforms.validators import __all__ as all_validators
 from wtforms.widgets.core import __all__ as all_widgets
 from textwrap import indent
+from threading import Lock
 
 try:
     from scrapli import Scrapli
@@ -89,6 +90,8 @@ class VariableStore:
         self.private_properties_set = set(sum(self.private_properties.values(), []))
         self.property_names = {}
         self.relationships = defaultdict(dict)
+        self.table_cache = {}
+        self.git_blob_cache, self.git_history_lock = {}, Lock()
 
     def _set_custom_variables(self):
         for model, values in self.properties["custom"].items():
@@ -159,10 +162,23 @@ class VariableStore:
         self.run_services = defaultdict(set)
         self.run_states = defaultdict(dict)
         self.run_logs = defaultdict(lambda: defaultdict(list))
+        self.run_results = defaultdict(deque)
+        self.run_device_cache = defaultdict(
+            lambda: {"id": {}, "name": {}, "ip_address": {}, "hit": 0, "miss": 0}
+        )
+        self.run_device_cache_lock = Lock()
         self.run_stop = defaultdict(bool)
+        self.run_timings = defaultdict(dict)
+        self.run_timings_lock = Lock()
         self.run_instances = {}
         libraries = ("netmiko", "napalm", "scrapli", "ncclient")
         self.connections_cache = {library: defaultdict(dict) for library in libraries}
+        self.connection_pool = {}
+        self.connection_pool_keys = {}
+        self.connection_pool_lock = Lock()
+        self.connection_pool_metrics = defaultdict(int)
+        self.connection_pool_reaper = None
+        self.connection_teardown_executor = None
         self.service_run_count = defaultdict(int)
 
     def set_template_context(self):
@@ -0,0 +1,406 @@
+# Mock device fleet: thousands of lightweight SSH / NETCONF endpoints served by a
+# single asyncio process, used to load-test the connection services offline.
+# Each device listens on its own loopback address (127.1.0.1, 127.1.0.2, ...) so
+# that services which use a fixed port (e.g NETCONF on 830) reach the right one.
+# CLI responses are scripted per netmiko driver (see DRIVERS) and can be extended
+# with a JSON file ("--responses"): {"<driver>": {"<command>": "<output>"}, "netconf":
+# {"<operation>": "<reply content>"}}.
+# Start the fleet from the eNMS folder, e.g:
+# python files/scripts/mock_devices.py serve --devices 10000
+# and create the matching migration (devices, pool, group and credential):
+# python files/scripts/mock_devices.py migration --devices 10000
+# (with the same FERNET_KEY environment variable as eNMS, if it is set)
+# then import the "mock_devices" migration from the admin panel.
+
+from argparse import ArgumentParser
+from asyncio import get_running_loop, run, sleep
+from base64 import b64encode
+from collections import Counter
+from datetime import datetime
+from ipaddress import ip_address
+from json import load
+from os import getenv
+from pathlib import Path
+from random import random
+from re import search
+from resource import getrlimit, RLIMIT_NOFILE, setrlimit
+from ruamel import yaml
+from warnings import warn
+
+try:
+    from cryptography.fernet import Fernet
+except ImportError as exc:
+    warn(f"Couldn't import cryptography module ({exc})")
+
+try:
+    from asyncssh import create_server, generate_private_key, SSHServer
+except ImportError as exc:
+    SSHServer = object
+    warn(f"Couldn't import asyncssh module ({exc})")
+
+RUNNING_CONFIG = """hostname {name}
+!
+interface Loopback0
+ ip address {ip_address} 255.255.255.255
+!
+end"""
+
+DRIVERS = {
+    "cisco_ios": {
+        "napalm_driver": "ios",
+        "netconf_driver": "csr",
+        "scrapli_driver": "cisco_iosxe",
+        "prompt": "{name}#",
+        "config_prompt": "{name}(config)#",
+        "config_commands": ("configure terminal", "conf t"),
+        "exit_config_commands": ("end",),
+        "commands": {
+            "show version": (
+                "Cisco IOS Software, Version 15.5(3)M\n"
+                "{name} uptime is 1 week, 2 days, 3 hours, 4 minutes\n"
+                "Processor board ID MOCK{index}"
+            ),
+            "show running-config": RUNNING_CONFIG,
+            "show ip interface brief": (
+                "Interface     IP-Address      OK? Method Status   Protocol\n"
+                "Loopback0     {ip_address}    YES manual up       up"
+            ),
+        },
+    },
+    "arista_eos": {
+        "napalm_driver": "eos",
+        "netconf_driver": "default",
+        "scrapli_driver": "arista_eos",
+        "prompt": "{name}#",
+        "config_prompt": "{name}(config)#",
+        "config_commands": ("configure terminal", "configure"),
+        "exit_config_commands": ("end",),
+        "commands": {
+            "terminal width 511": "Width set to 511 columns.",
+            "terminal length 0": "Pagination disabled.",
+            "show version": (
+                "Arista vEOS\nSoftware image version: 4.27.0F\n"
+                "Serial number: MOCK{index}"
+            ),
+            "show running-config": RUNNING_CONFIG,
+        },
+    },
+    "juniper_junos": {
+        "napalm_driver": "junos",
+        "netconf_driver": "junos",
+        "scrapli_driver": "juniper_junos",
+        "prompt": "{username}@{name}> ",
+        "config_prompt": "[edit]\n{username}@{name}# ",
+        "config_commands": ("configure", "configure private", "configure exclusive"),
+        "exit_config_commands": ("exit configuration-mode", "exit"),
+        "commands": {
+            "set cli screen-width 511": "Screen width set to 511",
+            "set cli complete-on-space off": "Disabling complete-on-space",
+            "set cli screen-length 0": "Screen length set to 0",
+            "configure": "Entering configuration mode",
+            "exit configuration-mode": "Exiting configuration mode",
+            "commit": "commit complete",
+            "show version": "Hostname: {name}\nModel: vmx\nJunos: 21.4R1",
+            "show configuration": "system {\n    host-name {name};\n}",
+        },
+    },
+}
+
+NETCONF_HELLO = """<?xml version="1.0" encoding="UTF-8"?>
+<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">
+  <capabilities>
+    <capability>urn:ietf:params:netconf:base:1.0</capability>
+  </capabilities>
+  <session-id>{session_id}</session-id>
+</hello>]]>]]>"""
+
+NETCONF_REPLY = (
+    '<rpc-reply xmlns="urn:ietf:params:xml:ns:netconf:base:1.0" '
+    'message-id="{message_id}">\n{content}\n</rpc-reply>]]>]]>'
+)
+
+NETCONF_DATA = """<data>
+  <native xmlns="http://mock.enms/device">
+    <hostname>{name}</hostname>
+    <ip-address>{ip_address}</ip-address>
+  </native>
+</data>"""
+
+statistics = Counter()
+
+
+def parse_arguments():
+    parser = ArgumentParser(description="eNMS mock device fleet")
+    parser.add_argument("mode", choices=("serve", "migration"))
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--first-address", default="127.1.0.1")
+    parser.add_argument("--drivers", default=",".join(DRIVERS))
+    parser.add_argument("--port", type=int, default=2222)
+    parser.add_argument("--netconf-port", type=int, default=830)
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin")
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--failure-rate", type=float, default=0)
+    parser.add_argument("--responses")
+    parser.add_argument("--statistics-interval", type=float, default=10)
+    parser.add_argument("--name", default="mock_devices")
+    return parser.parse_args()
+
+
+def get_devices(arguments):
+    drivers = arguments.drivers.split(",")
+    first_address = ip_address(arguments.first_address)
+    return [
+        {
+            "index": index,
+            "name": f"mock{index}",
+            "ip_address": str(first_address + index - 1),
+            "driver": drivers[(index - 1) % len(drivers)],
+        }
+        for index in range(1, arguments.devices + 1)
+    ]
+
+
+def substitute(text, device, username):
+    for property, value in {**device, "username": username}.items():
+        text = text.replace(f"{{{property}}}", str(value))
+    return text
+
+
+class MockDeviceServer(SSHServer):
+    def __init__(self, arguments):
+        self.arguments = arguments
+
+    def connection_made(self, connection):
+        statistics["connections"] += 1
+
+    def begin_auth(self, username):
+        return True
+
+    def password_auth_supported(self):
+        return True
+
+    def validate_password(self, username, password):
+        if random() < self.arguments.failure_rate:
+            statistics["simulated_failures"] += 1
+            return False
+        credentials = (self.arguments.username, self.arguments.password)
+        return (username, password) == credentials
+
+
+async def respond(process, output, latency):
+    if latency:
+        await sleep(latency)
+    process.stdout.write(output)
+
+
+async def run_command(process, device, profile, command, state, latency):
+    statistics["commands"] += 1
+    username = process.get_extra_info("username")
+    if command in ("exit", "logout", "quit") and not state["config_mode"]:
+        return False
+    if command in profile["config_commands"]:
+        state["config_mode"] = True
+    elif command in profile["exit_config_commands"]:
+        state["config_mode"] = False
+    output = profile["commands"].get(command, "")
+    prompt = profile["config_prompt" if state["config_mode"] else "prompt"]
+    output = f"{output}\n{prompt}" if output else prompt
+    await respond(
+        process, substitute(output, device, username).replace("\n", "\r\n"), latency
+    )
+    return True
+
+
+async def run_cli_session(process, device, profile, latency):
+    statistics["cli_sessions"] += 1
+    username, state = process.get_extra_info("username"), {"config_mode": False}
+    if process.command is not None:
+        output = profile["commands"].get(process.command.strip(), "")
+        await respond(process, substitute(output, device, username), latency)
+        return
+    await respond(process, substitute(profile["prompt"], device, username), latency)
+    line, previous = "", ""
+    while not process.stdin.at_eof():
+        data = await process.stdin.read(4096)
+        for character in data:
+            if character == "\n" and previous == "\r":
+                previous = character
+                continue
+            previous = character
+            if character in "\r\n":
+                process.stdout.write("\r\n")
+                command = line.strip()
+                if not await run_command(
+                    process, device, profile, command, state, latency
+                ):
+                    return
+                line = ""
+            else:
+                process.stdout.write(character)
+                line += character
+
+
+async def run_netconf_session(process, device, responses, latency):
+    statistics["netconf_sessions"] += 1
+    session_id = statistics["netconf_sessions"]
+    username, buffer = process.get_extra_info("username"), ""
+    process.stdout.write(NETCONF_HELLO.format(session_id=session_id))
+    while not process.stdin.at_eof():
+        buffer += await process.stdin.read(65536)
+        while "]]>]]>" in buffer:
+            message, buffer = buffer.split("]]>]]>", 1)
+            rpc = search(r"<(?:[\w-]+:)?rpc\b([^>]*)>\s*<(?:[\w-]+:)?([\w-]+)", message)
+            if not rpc:
+                continue
+            statistics["rpcs"] += 1
+            message_id = search(r'message-id="([^"]*)"', rpc.group(1))
+            content = substitute(responses.get(rpc.group(2), "<ok/>"), device, username)
+            await respond(
+                process,
+                NETCONF_REPLY.format(
+                    message_id=message_id.group(1) if message_id else "",
+                    content=content,
+                ),
+                latency,
+            )
+            if rpc.group(2) == "close-session":
+                return
+
+
+def get_session_handler(arguments, device, profile, netconf_responses):
+    async def handle_session(process):
+        try:
+            if process.subsystem == "netconf":
+                await run_netconf_session(
+                    process, device, netconf_responses, arguments.latency
+                )
+            else:
+                await run_cli_session(process, device, profile, arguments.latency)
+        except Exception as exc:
+            statistics["errors"] += 1
+            print(f"{device['name']}: {exc}")
+        finally:
+            process.exit(0)
+
+    return handle_session
+
+
+async def report_statistics(interval):
+    while True:
+        await sleep(interval)
+        print(f"{datetime.now()} - {dict(statistics)}")
+
+
+async def serve(arguments):
+    profiles = {driver: dict(profile) for driver, profile in DRIVERS.items()}
+    netconf_responses = {"get": NETCONF_DATA, "get-config": NETCONF_DATA}
+    if arguments.responses:
+        with open(arguments.responses) as file:
+            responses = load(file)
+        netconf_responses.update(responses.pop("netconf", {}))
+        for driver, commands in responses.items():
+            profile = profiles.setdefault(driver, dict(DRIVERS["cisco_ios"]))
+            profile["commands"] = {**profile["commands"], **commands}
+    devices, ports = get_devices(arguments), {arguments.port, arguments.netconf_port}
+    required_descriptors = len(devices) * len(ports) + 1000
+    _, hard_limit = getrlimit(RLIMIT_NOFILE)
+    if hard_limit < required_descriptors:
+        raise SystemExit(
+            f"{required_descriptors} file descriptors are needed for {len(devices)} "
+            f"devices ({hard_limit} allowed): raise the limit with 'ulimit -n'"
+        )
+    setrlimit(RLIMIT_NOFILE, (hard_limit, hard_limit))
+    host_key = generate_private_key("ssh-ed25519")
+    for device in devices:
+        profile = profiles[device["driver"]]
+        handler = get_session_handler(arguments, device, profile, netconf_responses)
+        for port in ports:
+            await create_server(
+                lambda: MockDeviceServer(arguments),
+                device["ip_address"],
+                port,
+                server_host_keys=[host_key],
+                process_factory=handler,
+                line_editor=False,
+            )
+    print(
+        f"{len(devices)} mock devices listening on {devices[0]['ip_address']} - "
+        f"{devices[-1]['ip_address']} (SSH: {arguments.port}, "
+        f"NETCONF: {arguments.netconf_port})"
+    )
+    if arguments.statistics_interval:
+        get_running_loop().create_task(report_statistics(arguments.statistics_interval))
+    await get_running_loop().create_future()
+
+
+def encrypt_password(password):
+    # same encryption as env.encrypt_password, without starting the application
+    fernet_key = getenv("FERNET_KEY")
+    encrypt = Fernet(fernet_key).encrypt if fernet_key else b64encode
+    return str(encrypt(password.encode()), "utf-8")
+
+
+def create_migration(arguments):
+    path = Path.cwd() / "files" / "migrations" / arguments.name
+    path.mkdir(parents=True, exist_ok=True)
+    devices = get_devices(arguments)
+    pool_name = "Mock Devices"
+    with open("package.json") as file:
+        version = load(file)["version"]
+    migration = {
+        "metadata": {"export_time": str(datetime.now()), "version": version},
+        "device": [
+            {
+                "name": device["name"],
+                "ip_address": device["ip_address"],
+                "port": arguments.port,
+                "model": "Mock",
+                "vendor": "Mock",
+                "icon": "router",
+                "netmiko_driver": device["driver"],
+                **{
+                    property: DRIVERS.get(device["driver"], {}).get(property, "")
+                    for property in ("napalm_driver", "netconf_driver")
+                },
+                "scrapli_driver": DRIVERS.get(device["driver"], {}).get(
+                    "scrapli_driver", "cisco_iosxe"
+                ),
+            }
+            for device in devices
+        ],
+        "pool": [
+            {
+                "name": pool_name,
+                "description": "Mock devices (files/scripts/mock_devices.py)",
+                "device_name": r"mock\d+",
+                "device_name_match": "regex",
+                "devices": [device["name"] for device in devices],
+            }
+        ],
+        "group": [{"name": "Mock Devices Users", "users": [arguments.username]}],
+        "credential": [
+            {
+                "name": "Mock Devices Credentials",
+                "username": arguments.username,
+                "password": encrypt_password(arguments.password),
+                "subtype": "password",
+                "role": "read-write",
+                "priority": 1,
+                "device_pools": [pool_name],
+                "groups": ["Mock Devices Users"],
+            }
+        ],
+    }
+    for model, instances in migration.items():
+        with open(path / f"{model}.yaml", "w") as migration_file:
+            yaml.dump(instances, migration_file)
+    print(f"Migration '{arguments.name}' created with {len(devices)} devices")
+
+
+if __name__ == "__main__":
+    arguments = parse_arguments()
+    if arguments.mode == "serve":
+        run(serve(arguments))
+    else:
+        create_migration(arguments)
@@ -0,0 +1,42 @@
+# Checks that the configuration searches give the same results with the
+# deduplicated configuration storage when the match crosses the boundary
+# between two chunks, or relies on anchors over the whole configuration.
+# "deduplication" must be enabled in database.json > configuration_storage.
+# flake8: noqa
+
+from re import escape
+
+configuration = "".join(
+    f"interface Ethernet{index}\n description port {index}\n" for index in range(500)
+)
+chunks = db.split_configuration(configuration)
+last_line, first_line = chunks[0].splitlines()[-1], chunks[1].splitlines()[0]
+
+device = db.factory("device", name="configuration_search_chunks", rbac=None)
+device.update_configuration("configuration", configuration)
+db.session.commit()
+
+boundary_regex = f"{escape(last_line)}\\s+{escape(first_line)}"
+searches = (
+    ("Inclusion across two chunks", f"{last_line}\n{first_line}", "inclusion", True),
+    ("Regex across two chunks", boundary_regex, "regex", True),
+    ("Regex anchored to the start", "^interface Ethernet0\n", "regex", True),
+    ("Regex anchored to a chunk start", f"^{escape(first_line)}", "regex", False),
+)
+table = models["device"]
+for name, value, filter_value, expected in searches:
+    constraint = db.get_configuration_constraint(
+        table.configuration, "configuration", value, filter_value
+    )
+    query = db.query("device", rbac=None).filter(table.id == device.id, constraint)
+    status = "OK" if bool(query.count()) == expected else "FAILED"
+    print(f"{name}: {status}")
+
+try:
+    db.get_configuration_constraint(table.configuration, "configuration", "(", "regex")
+    print("Invalid regex reported: FAILED")
+except db.regex_error:
+    print("Invalid regex reported: OK")
+
+db.delete_instance(device)
+db.session.commit()
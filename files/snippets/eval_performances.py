@@ -0,0 +1,45 @@
+# Measures the duration of a per device run with a skip query
+# evaluated for each device, with and without the compiled code
+# cache used by "Runner.eval".
+# flake8: noqa
+
+from datetime import datetime
+from eNMS.runner import Runner
+
+run_number = 5
+
+skip_query = """(
+    device.vendor in ("Cisco", "Juniper", "Arista")
+    and any(pool.name.startswith("Test") for pool in device.pools)
+    or len(device.name) > 20 and device.name[:3] in ("Bal", "Was", "Bos")
+)"""
+
+service = db.factory(
+    "python_snippet_service",
+    scoped_name="eval_performances",
+    source_code="results['success'] = True",
+    skip_query=skip_query,
+    skip_value="discard",
+    target_devices=[device.id for device in db.fetch_all("device")],
+    commit=True,
+    rbac=None,
+)
+
+
+def run_service():
+    start = datetime.now()
+    for _ in range(run_number):
+        controller.run(service.id, runtime=vs.get_time(), creator="admin")
+    return (datetime.now() - start) / run_number
+
+
+compile_code = Runner.compile_code
+Runner.compile_code = staticmethod(compile_code.__wrapped__)
+print(f"Without compiled code cache: {run_service()} per run")
+Runner.compile_code = staticmethod(compile_code)
+compile_code.cache_clear()
+print(f"With compiled code cache: {run_service()} per run")
+print(compile_code.cache_info())
+
+db.delete_instance(service)
+db.session.commit()
@@ -0,0 +1,55 @@
+# Compares the YAML and compressed JSON Lines migration formats:
+# export time, file size and import time of the device table.
+# Devices named "migration_performances-<n>" are created first so that
+# the inventory contains at least "device_number" devices (10000 and
+# 100000 for the reference measurements); they are deleted at the end.
+# flake8: noqa
+
+from datetime import datetime
+from os.path import getsize
+from pathlib import Path
+from shutil import rmtree
+
+device_number = 10000
+batch_size = db.transactions["import_batch_size"]
+
+existing_devices = len(db.fetch_all("device", rbac=None))
+for index in range(existing_devices, device_number):
+    db.factory(
+        "device",
+        name=f"migration_performances-{index}",
+        ip_address=f"10.{index // 65536}.{index // 256 % 256}.{index % 256}",
+        vendor="Cisco",
+        operating_system="IOS-XE",
+        rbac=None,
+    )
+    if not index % batch_size:
+        db.session.commit()
+db.session.commit()
+
+for export_format, extension in (("yaml", "yaml"), ("jsonl", "jsonl.gz")):
+    name = f"migration_performances_{export_format}"
+    start = datetime.now()
+    controller.migration_export(
+        name=name,
+        import_export_types=["device"],
+        export_private_properties=False,
+        export_format=export_format,
+    )
+    export_time = datetime.now() - start
+    size = getsize(Path(vs.migration_path) / name / f"device.{extension}")
+    start = datetime.now()
+    controller.migration_import(
+        name=name, import_export_types=["device"], streaming_import=True
+    )
+    import_time = datetime.now() - start
+    print(
+        f"{export_format}: export {export_time}, import {import_time}, "
+        f"file size {size / 1000:.0f} kB"
+    )
+    rmtree(Path(vs.migration_path) / name)
+
+for device in db.fetch_all("device", rbac=None):
+    if device.name.startswith("migration_performances-"):
+        db.delete_instance(device)
+db.session.commit()
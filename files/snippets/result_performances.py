@@ -0,0 +1,70 @@
+# Measures the number of results written per second with
+# 'db.factory' (one ORM object per device result) and with the
+# bulk insert used by the runner result buffer.
+# Run it once with SQLite and once with PostgreSQL (DATABASE_URL)
+# to compare both databases.
+# flake8: noqa
+
+from datetime import datetime
+
+result_number = 5000
+batch_size = db.transactions["result_batch_size"] or 500
+
+service = db.fetch("service", name="[Shared] Start")
+devices = db.fetch_all("device")
+run = db.factory(
+    "run", service=service.id, runtime=vs.get_time(), commit=True, rbac=None
+)
+
+
+def result_kwargs(index):
+    results = {
+        "runtime": vs.get_time(),
+        "duration": "0:00:01",
+        "success": True,
+        "result": f"show version output for device n°{index}" * 20,
+    }
+    return {
+        "parent_runtime": run.runtime,
+        "parent_service_id": service.id,
+        "path": str(service.id),
+        "run_id": run.id,
+        "service_id": service.id,
+        "device_id": devices[index % len(devices)].id,
+        "creator": "admin",
+        "result": results,
+    }
+
+
+factory_time = datetime.now()
+for index in range(result_number):
+    db.factory("result", rbac=None, **result_kwargs(index))
+db.session.commit()
+duration = (datetime.now() - factory_time).total_seconds()
+print(f"'db.factory': {result_number / duration:.0f} rows/sec")
+
+table = vs.models["result"].__table__
+bulk_time = datetime.now()
+rows = []
+for index in range(result_number):
+    kwargs = result_kwargs(index)
+    rows.append(
+        {
+            **kwargs,
+            **{
+                key: kwargs["result"][key] for key in ("duration", "runtime", "success")
+            },
+        }
+    )
+    if len(rows) == batch_size:
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+        rows = []
+if rows:
+    db.session.execute(table.insert(), rows)
+    db.session.commit()
+duration = (datetime.now() - bulk_time).total_seconds()
+print(f"Bulk insert ({batch_size} per batch): {result_number / duration:.0f} rows/sec")
+
+db.delete_instance(run)
+db.session.commit()